@@ -0,0 +1,22 @@
+"""Performance benchmarks for docopt.
+
+Run from the repository root, e.g. ``python -m benchmarks.repeating``.
+``python -m benchmarks.suite`` runs the whole suite and writes its
+results as JSON, to compare them with a saved run.
+
+"""
+import timeit
+
+
+def best(func, number=1, repeat=3):
+    """Best wall time of `repeat` runs of `func` (seconds per call)."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def table(header, rows):
+    """Print `rows` aligned under `header`."""
+    rows = [header] + [['%.6f' % c if type(c) is float else str(c)
+                        for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    for row in rows:
+        print('  '.join(c.rjust(w) for c, w in zip(row, widths)))
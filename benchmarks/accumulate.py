@@ -0,0 +1,52 @@
+"""Accumulating repeated options, counted flags and commands.
+
+Times `Docopt.parse` of argv with ``-I <dir>``, ``-v`` and ``go`` each
+repeated n times, interleaved with non-repeating options.  Run with
+``--old <path>`` to also time the docopt module found in another
+checkout, e.g. a ``git worktree`` of an earlier commit.
+
+"""
+import sys
+
+from benchmarks import best, table
+
+DOC = """Usage: prog (go [-I <dir>] [-v] [-a] [-b] [-c] [-d])...
+
+Options:
+  -I <dir>  Include directory.
+  -v  Verbose.
+  -a, -b, -c, -d  Flags.
+"""
+
+
+def argv(n):
+    return ['go', '-I', 'dir', '-v', '-a', '-b', '-c', '-d'] * n
+
+
+def measure(docopt_module, sizes):
+    parser = docopt_module.Docopt(DOC)
+    return [best(lambda: parser.parse(argv(n))) for n in sizes]
+
+
+def main():
+    sizes = [100, 1000, 5000, 20000]
+    header, columns = ['n'], []
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt', None)
+        import docopt as old
+        header.append('old')
+        columns.append(measure(old, sizes))
+        sys.path.pop(0)
+        sys.modules.pop('docopt')
+    import docopt
+    header.append('new' if columns else 'seconds')
+    columns.append(measure(docopt, sizes))
+    print('Seconds to parse argv with n repetitions of '
+          'go -I dir -v -a -b -c -d:\n')
+    table(header, [[n] + [c[i] for c in columns]
+                   for i, n in enumerate(sizes)])
+
+
+if __name__ == '__main__':
+    main()
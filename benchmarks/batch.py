@@ -0,0 +1,56 @@
+"""Throughput of `parse_many` over many stored command lines.
+
+Reports argvs parsed per second against the doc of
+``examples/naval_fate.py``, in-process and with 1, 2, 4 and 8 worker
+processes (which only helps with as many CPUs), and for columnar
+output.
+
+"""
+import ast
+import os
+import time
+
+from docopt import parse_many
+
+from benchmarks import table
+
+ARGVS = ['ship new Guardian Titanic',
+         'ship Guardian move 10 50 --speed=20',
+         'ship shoot 3 4',
+         'mine set 1 2 --moored',
+         'mine remove 5 6 --drifting',
+         'ship Guardian move 10',  # fails
+         '--version']
+
+
+def naval_fate():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                        'examples', 'naval_fate.py')
+    with open(path) as f:
+        return ast.get_docstring(ast.parse(f.read()), clean=False)
+
+
+def throughput(n, **kwargs):
+    doc, argvs = naval_fate(), ARGVS * (n // len(ARGVS))
+    start = time.time()
+    results = parse_many(doc, argvs, **kwargs)
+    if not kwargs.get('columns'):
+        for _ in results:
+            pass
+    return len(argvs) / (time.time() - start)
+
+
+def main():
+    n = 100000
+    rows = [['in-process', throughput(n)],
+            ['columns', throughput(n, columns=True)]]
+    for processes in (1, 2, 4, 8):
+        rows.append(['%d processes' % processes,
+                     throughput(n, processes=processes, chunksize=1000)])
+    print('argvs per second, parsing %d argvs (%d CPUs):\n' %
+          (n, os.cpu_count() if hasattr(os, 'cpu_count') else 0))
+    table(['mode', 'argv/s'], [[mode, '%.0f' % rate] for mode, rate in rows])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""First-command dispatch of usage lines.
+
+Times matching argv that selects the last command of a usage with n
+lines.  The compiled engine only tries the lines that can start with
+that command (and those that start with an option or argument); the
+tree engine tries them all.  Run with ``--old <path>`` to also time the
+compiled engine of the docopt module found in another checkout, e.g. a
+``git worktree`` of an earlier commit.
+
+"""
+import sys
+
+from benchmarks import best, table
+from benchmarks.synthetic import many_commands
+
+
+def measure(docopt_module, sizes, engines):
+    times = []
+    for n in sizes:
+        argv = ['cmd%d' % (n - 1), 'a', '-v', 'b', '--force']
+        row = []
+        for engine in engines:
+            parser = docopt_module.Docopt(many_commands(n), engine=engine)
+            patterns = docopt_module.parse_argv(
+                docopt_module.Tokens(argv), list(parser.options))
+            state = lambda: docopt_module.MatchState(
+                docopt_module.Argv(patterns, None, parser.names))
+            row.append(best(lambda: parser.match_state(state()), 20))
+        times.append(row)
+    return times
+
+
+def main():
+    sizes = [50, 150, 500]
+    header, columns = ['lines'], []
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt', None)
+        import docopt as old
+        header.append('old compiled')
+        columns.append(measure(old, sizes, ['compiled']))
+        sys.path.pop(0)
+        sys.modules.pop('docopt')
+    import docopt
+    header += ['tree', 'compiled']
+    columns.append(measure(docopt, sizes, ['tree', 'compiled']))
+    print('Seconds to match argv against a usage with n lines:\n')
+    table(header, [[n] + sum([c[i] for c in columns], [])
+                   for i, n in enumerate(sizes)])
+
+
+if __name__ == '__main__':
+    main()
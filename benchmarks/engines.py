@@ -0,0 +1,77 @@
+"""Matching engines: compiled matcher functions versus tree walking.
+
+Times matching (`Docopt.parse` without parsing argv into options and
+arguments) with ``engine='compiled'`` and ``engine='tree'`` on the
+fixtures of ``testcases.docopt`` and on synthetic grammars with many
+usage lines and options.
+
+"""
+import io
+import os
+import sys
+
+from docopt import (Docopt, DocoptExit, DocoptLanguageError, Tokens, Argv,
+                    MatchState, parse_argv)
+
+from benchmarks import best, table
+from benchmarks.synthetic import many_options
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from conftest import parse_test  # noqa: E402
+
+
+def fixtures():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                        'testcases.docopt')
+    with io.open(path) as f:
+        for _, doc, cases in parse_test(f.read()):
+            try:
+                Docopt(doc)
+            except DocoptLanguageError:
+                continue
+            yield doc, [argv for _, argv, _ in cases
+                        if '-h' not in argv and '--help' not in argv]
+
+
+def parsed(parser, argvs):
+    """`argvs` parsed into patterns, as `Docopt.parse` matches them."""
+    for argv in argvs:
+        try:
+            yield parse_argv(Tokens(argv), list(parser.options),
+                             parser.options_first)
+        except DocoptExit:
+            pass
+
+
+def match_all(parser, argvs):
+    for argv in argvs:
+        parser.match_state(MatchState(Argv(argv, None, parser.names)))
+
+
+def measure(docs, number):
+    """Seconds per round of matching all argvs of `docs` with each engine."""
+    times = []
+    for engine in Docopt.engines:
+        parsers = [Docopt(doc, engine=engine) for doc, _ in docs]
+        parsers = [(p, list(parsed(p, argvs)))
+                   for p, (_, argvs) in zip(parsers, docs)]
+        times.append(best(lambda: [match_all(p, argvs)
+                                   for p, argvs in parsers], number))
+    return times
+
+
+def main():
+    rows = [['testcases.docopt'] + measure(list(fixtures()), 200)]
+    for n in (100, 1000):
+        doc = many_options(n)
+        last = n // 10 - 1
+        argvs = [['cmd%d' % last, '-v', '--opt%d=x' % (n - 1), 'f1', 'f2'],
+                 ['cmd0', '--opt3', 'y', 'f'], ['cmd%d' % last]]
+        rows.append(['%d options, %d usages' % (n, n // 10)] +
+                    measure([(doc, argvs)], 200))
+    print('Seconds to match all argvs of each grammar:\n')
+    table(['grammar'] + list(Docopt.engines), rows)
+
+
+if __name__ == '__main__':
+    main()
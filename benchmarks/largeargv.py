@@ -0,0 +1,65 @@
+"""Parsing `<file>...` with 10^3 to 10^6 positional arguments.
+
+Times `Docopt.parse` and reports its peak memory (traced by
+`tracemalloc`) for argv as passed by ``xargs`` or ``find -exec ... +``,
+with and without ``--``.  Run with ``--old <path>`` to also time the
+docopt module found in another checkout, e.g. a ``git worktree`` of an
+earlier commit.
+
+"""
+import sys
+import time
+import tracemalloc
+
+from benchmarks import table
+
+DOCS = ['usage: prog [-v] <file>...', 'usage: prog [-v] [--] <file>...']
+
+
+def argv(n, dashes):
+    return ['-v'] + (['--'] if dashes else []) + \
+        ['file%d' % i for i in range(n)]
+
+
+def measure(docopt_module, sizes):
+    """Seconds and peak MiB of each parse, in order of `DOCS` and `sizes`."""
+    results = []
+    for dashes, doc in enumerate(DOCS):
+        parser = docopt_module.Docopt(doc)
+        for n in sizes:
+            args = argv(n, dashes)
+            tracemalloc.start()
+            start = time.time()
+            parser.parse(args)
+            seconds = time.time() - start
+            peak = tracemalloc.get_traced_memory()[1] / 2.0 ** 20
+            tracemalloc.stop()
+            results.append((seconds, peak))
+    return results
+
+
+def main():
+    sizes = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+    header, columns = ['doc', 'files'], []
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt', None)
+        import docopt as old
+        header += ['old s', 'old MiB']
+        columns.append(measure(old, sizes))
+        sys.path.pop(0)
+        sys.modules.pop('docopt')
+    import docopt
+    header += ['s', 'MiB']
+    columns.append(measure(docopt, sizes))
+    rows = [[doc.split(' ', 2)[2], n] for doc in DOCS for n in sizes]
+    for column in columns:
+        for row, (seconds, peak) in zip(rows, column):
+            row += [seconds, peak]
+    print('Seconds and peak memory (tracemalloc) to parse argv with n '
+          'files:\n')
+    table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Matching linear usage patterns in a single pass.
+
+For the doc of each script in ``examples/``, times `Docopt.parse` of an
+argv that uses every leaf of the pattern it can (and only the required
+ones if that one does not parse), and tells whether the pattern is
+linear (see `docopt.linear`).  Run with ``--old <path>`` to also time
+the docopt module found in another checkout, e.g. a ``git worktree``
+of an earlier commit.
+
+"""
+import ast
+import glob
+import os
+import sys
+
+from benchmarks import best, table
+
+
+def examples():
+    """(name, doc) of each script in ``examples/`` that has a usage."""
+    root = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                        'examples')
+    for path in sorted(glob.glob(os.path.join(root, '*.py')) +
+                       glob.glob(os.path.join(root, '*', '*.py'))):
+        with open(path) as f:
+            doc = ast.get_docstring(ast.parse(f.read()), clean=False)
+        if doc and 'usage:' in doc.lower():
+            yield os.path.relpath(path, root), doc
+
+
+def sample(pattern, optional=True):
+    """An argv for `pattern`: the first alternative of each `Either`,
+    and optional leaves only if `optional`."""
+    name = type(pattern).__name__
+    if name == 'Command':
+        return [pattern.name]
+    elif name == 'Argument':
+        return ['x']
+    elif name == 'Option':
+        return [pattern.name] + ['x'] * pattern.argcount
+    elif name == 'Either':
+        return sample(pattern.children[0], optional)
+    elif name in ('Optional', 'OptionsShortcut') and not optional:
+        return []
+    return sum((sample(child, optional) for child in pattern.children), [])
+
+
+def argvs(docopt_module):
+    """(name, doc, argv) of each example with an argv that parses."""
+    for name, doc in examples():
+        parser = docopt_module.Docopt(doc, help=False)
+        for optional in (True, False):
+            argv = sample(parser.pattern, optional)
+            try:
+                parser.parse(argv)
+            except SystemExit:
+                continue
+            yield name, doc, argv
+            break
+
+
+def measure(docopt_module, cases):
+    return [best(lambda: parser.parse(argv), 1000) for parser, argv in
+            ((docopt_module.Docopt(doc, help=False), argv)
+             for _, doc, argv in cases)]
+
+
+def main():
+    import docopt
+    cases = list(argvs(docopt))
+    columns = [[name for name, _, _ in cases],
+               ['yes' if docopt.Docopt(doc).match_linear else 'no'
+                for _, doc, _ in cases]]
+    header = ['example', 'linear']
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt')
+        import docopt as old
+        columns.append(measure(old, cases))
+        header.append('old')
+        sys.path.pop(0)
+        sys.modules['docopt'] = docopt
+    columns.append(measure(docopt, cases))
+    header.append('new')
+    print('Seconds to parse an argv against the doc of each example:\n')
+    table(header, list(zip(*columns)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Matching time as the argument vector grows.
+
+Run with ``--old <path>`` to also time the docopt module found in
+another checkout, e.g. a ``git worktree`` of an earlier commit.
+
+"""
+import sys
+
+from benchmarks import best, table
+
+DOC = """Usage: prog [-v] [-q] [--level=<n>] <src> <dst>...
+
+Options:
+  -v  Verbose.
+  -q  Quiet.
+  --level=<n>  Level [default: 1].
+"""
+
+
+def argv(n):
+    return ['-v', 'src'] + ['dst%d' % i for i in range(n)] + ['--level=2']
+
+
+def measure(docopt_module, sizes):
+    parser = docopt_module.Docopt(DOC)
+    return [best(lambda: parser.parse(argv(n))) for n in sizes]
+
+
+def main():
+    sizes = [10, 100, 1000, 10000]
+    header, columns = ['argv'], []
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt', None)
+        import docopt as old
+        header.append('old')
+        columns.append(measure(old, sizes))
+        sys.path.pop(0)
+        sys.modules.pop('docopt')
+    import docopt
+    header.append('new' if columns else 'seconds')
+    columns.append(measure(docopt, sizes))
+    print('Seconds to parse argv with n positional arguments:\n')
+    table(header, [[n + 3] + [c[i] for c in columns]
+                   for i, n in enumerate(sizes)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Option lookup as the number of described options grows.
+
+Times parsing an argv of long options, abbreviations and short options
+into patterns.  Run with ``--old <path>`` to also time the docopt module
+found in another checkout, e.g. a ``git worktree`` of an earlier commit.
+
+"""
+import sys
+
+from benchmarks import best, table
+from benchmarks.synthetic import many_options
+
+
+def argv(n):
+    return (['--opt%d=x' % i for i in range(0, n, n // 50)] +
+            ['--opt%d' % (n - 1), 'y', '-v', '-vvv'] * 50)
+
+
+def measure(docopt_module, sizes):
+    times = []
+    for n in sizes:
+        parser = docopt_module.Docopt(many_options(n))
+        if hasattr(docopt_module, 'Options'):
+            options = lambda: docopt_module.Options(base=parser.options)
+        else:
+            options = lambda: list(parser.options)
+        times.append(best(lambda: docopt_module.parse_argv(
+            docopt_module.Tokens(argv(n)), options()), 10))
+    return times
+
+
+def main():
+    sizes = [100, 300, 1000, 3000]
+    header, columns = ['options'], []
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt', None)
+        import docopt as old
+        header.append('old')
+        columns.append(measure(old, sizes))
+        sys.path.pop(0)
+        sys.modules.pop('docopt')
+    import docopt
+    header.append('new' if columns else 'seconds')
+    columns.append(measure(docopt, sizes))
+    print('Seconds to parse an argv of 250 options against a doc with n '
+          'options:\n')
+    table(header, [[n] + [c[i] for c in columns]
+                   for i, n in enumerate(sizes)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Memory of parse results: `Dict` versus `Record`.
+
+Keeps n results of parsing argvs against the doc of
+``examples/naval_fate.py`` and reports the memory they take (traced by
+`tracemalloc`, not counting the argv strings they share) and the size
+of pickling them all.
+
+"""
+import pickle
+import tracemalloc
+
+from docopt import Docopt
+
+from benchmarks import table
+from benchmarks.batch import naval_fate
+
+ARGVS = [['ship', 'new', 'Guardian%d'], ['ship', 'shoot', '%d', '4'],
+         ['ship', 'Guardian', 'move', '%d', '50', '--speed=20'],
+         ['mine', 'set', '1', '%d', '--moored']]
+
+
+def measure(parser, n, record):
+    argvs = [[a % i if '%' in a else a for a in ARGVS[i % len(ARGVS)]]
+             for i in range(n)]
+    tracemalloc.start()
+    results = [parser.parse(argv, record=record) for argv in argvs]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / 2.0 ** 20, len(pickle.dumps(results, 2)) / 2.0 ** 20
+
+
+def main():
+    parser = Docopt(naval_fate())
+    rows = []
+    for n in (10 ** 4, 10 ** 5):
+        for record in (False, True):
+            memory, pickled = measure(parser, n, record)
+            rows.append([n, 'Record' if record else 'Dict', memory,
+                         memory * 2 ** 20 / n, pickled])
+    print('Memory of n results of parsing against naval_fate.py '
+          '(%d names):\n' % len(parser.layout.names))
+    table(['n', 'result', 'MiB', 'bytes each', 'pickled MiB'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Latency of `cmd.Cmd` shells with n docopt commands.
+
+Times one line typed into a shell with n ``do_*`` commands, cycling
+through all of them, for methods decorated with `docopt_cmd` and for
+methods calling `docopt` on each line (which recompiles docs once
+there are more commands than `compile_cache` holds).  Also compares
+`shell_split` with `shlex.split`.
+
+"""
+import cmd
+import shlex
+
+from docopt import docopt, docopt_cmd, shell_split
+
+from benchmarks import best, table
+
+DOC = 'Usage: cmd%d [-f] [--level=<n>] <src> <dst>'
+LINE = '-f --level=2 "my file.txt" \'other dir\''
+
+
+def shell(n, compiled):
+    methods = {}
+    for i in range(n):
+        if compiled:
+            def do(self, args):
+                return args
+        else:
+            def do(self, line, doc=DOC % i):
+                return docopt(doc, shlex.split(line))
+        do.__doc__ = DOC % i
+        methods['do_cmd%d' % i] = docopt_cmd(do) if compiled else do
+    return type('Shell', (cmd.Cmd,), methods)()
+
+
+def latency(n, compiled):
+    s = shell(n, compiled)
+    lines = ['cmd%d %s' % (i, LINE) for i in range(n)]
+    return best(lambda: [s.onecmd(line) for line in lines], 3) / n
+
+
+def main():
+    rows = [[n, latency(n, False), latency(n, True)]
+            for n in (10, 100, 1000)]
+    print('Seconds per line in a shell with n commands:\n')
+    table(['n', 'docopt()', 'docopt_cmd'], rows)
+    print('\nSeconds to split %r:\n' % LINE)
+    table(['shlex.split', 'shell_split'],
+          [[best(lambda: shlex.split(LINE), 10000),
+            best(lambda: shell_split(LINE), 10000)]])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Memory and allocations of pattern nodes.
+
+Reports, as traced by `tracemalloc`, the memory held by a compiled
+parser of a doc with 1000 options (and the number of blocks it takes),
+and the peak memory of parsing an argv of 10^5 tokens.  Run with
+``--old <path>`` to also measure the docopt module found in another
+checkout, e.g. a ``git worktree`` of an earlier commit.
+
+"""
+import sys
+import tracemalloc
+
+from benchmarks import table
+from benchmarks.synthetic import many_options
+
+
+def traced(func):
+    """(result, MiB held, blocks held, peak MiB) of calling `func`."""
+    tracemalloc.start()
+    result = func()
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    return result, current / 2.0 ** 20, blocks, peak / 2.0 ** 20
+
+
+def measure(docopt_module):
+    doc = many_options(1000)
+    parser, held, blocks, _ = traced(lambda: docopt_module.Docopt(doc))
+    argv = (['cmd99', '-v', '--opt995=x'] +
+            ['file%d' % i for i in range(10 ** 5)])
+    _, _, _, peak = traced(lambda: parser.parse(argv))
+    return [held, blocks, peak]
+
+
+def main():
+    rows = []
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt', None)
+        import docopt as old
+        rows.append(['old'] + measure(old))
+        sys.path.pop(0)
+        sys.modules.pop('docopt')
+    import docopt
+    rows.append(['new'] + measure(docopt))
+    print('Memory of compiling a doc with 1000 options, and peak memory '
+          'of parsing 10^5 arguments with it:\n')
+    table(['', 'compiled MiB', 'blocks', 'parse peak MiB'], rows)
+
+
+if __name__ == '__main__':
+    main()
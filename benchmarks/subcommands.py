@@ -0,0 +1,52 @@
+"""Start-up time of a CLI with n subcommands.
+
+Times registering n subcommand docs with `Subcommands` and parsing an
+invocation of one of them, from a cold `compile_cache`, next to
+compiling all n docs up front.
+
+"""
+from docopt import Subcommands, compile, compile_cache
+
+from benchmarks import best, table
+
+DOC = """usage: prog [-v] [--config=<file>] <command> [<args>...]
+
+options:
+  -v  Verbose.
+  --config=<file>  Configuration.
+"""
+
+SUB_DOC = """usage: prog cmd%d [options] <src> <dst>...
+
+options:
+  -f, --force  Force.
+  -n, --dry-run  Dry run.
+  --level=<n>  Level [default: 1].
+"""
+
+
+def lazy(n):
+    compile_cache.clear()
+    cli = Subcommands(DOC)
+    for i in range(n):
+        cli.add('cmd%d' % i, SUB_DOC % i)
+    return cli.parse(['-v', 'cmd0', '-f', 'a', 'b'])
+
+
+def eager(n):
+    compile_cache.clear()
+    parsers = dict(('cmd%d' % i, compile(SUB_DOC % i)) for i in range(n))
+    args = compile(DOC, options_first=True).parse(['-v', 'cmd0', '-f', 'a',
+                                                   'b'])
+    return parsers[args['<command>']].parse(['cmd0'] + args['<args>'])
+
+
+def main():
+    rows = [[n, best(lambda: lazy(n)), best(lambda: eager(n))]
+            for n in (1, 10, 100, 1000)]
+    print('Seconds to start a CLI with n subcommands and parse one:\n')
+    table(['n', 'Subcommands', 'compile all'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Benchmark suite: compile, parse, start-up time and memory, as JSON.
+
+Measures compiling (`Docopt`) and parsing for every fixture of
+``testcases.docopt`` (all of its argvs) and for the doc of every script
+in ``examples/`` (an argv from `benchmarks.linear.sample`), for
+synthetic grammars that scale (many options, many usage lines, deep
+nesting, huge argv), the time of ``python <script> --help`` for every
+example, and the peak memory traced by `tracemalloc` while compiling
+and parsing the synthetic grammars.
+
+Results are written as JSON, by benchmark name, so that a run can be
+saved and compared with a later one::
+
+    python -m benchmarks.suite --output=baseline.json
+    python -m benchmarks.suite --compare=baseline.json
+
+Usage:
+  suite.py [--output=<file>] [--compare=<file>] [--threshold=<ratio>]
+           [--only=<prefix>]
+  suite.py (-h | --help)
+
+Options:
+  -h --help            Show this screen.
+  --output=<file>      Write results to <file> ("-" for standard output).
+  --compare=<file>     Print how results compare with those in <file>,
+                       and exit with status 1 if any got slower (or
+                       bigger) by more than the threshold.
+  --threshold=<ratio>  Ratio of new to saved results that counts as a
+                       regression [default: 1.25].
+  --only=<prefix>      Run only benchmarks whose names start with
+                       <prefix>, e.g. "parse/" or "startup/".
+
+"""
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from docopt import Docopt, DocoptLanguageError, docopt
+
+from benchmarks import best, table
+from benchmarks import linear
+from benchmarks.synthetic import (many_options, many_commands, deep_nesting,
+                                  huge_argv)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from conftest import parse_test  # noqa: E402
+
+
+def timed(func):
+    """Best seconds per call of `func`, called often enough to tell."""
+    number = 1
+    while best(func, number, 1) * number < 0.02 and number < 10 ** 6:
+        number *= 10
+    return best(func, number, repeat=5)
+
+
+def traced(func):
+    """Peak bytes allocated while calling `func`."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def parse_all(parser, argvs):
+    for argv in argvs:
+        try:
+            parser.parse(argv)
+        except SystemExit:  # wrong usage, --help or --version
+            pass
+
+
+def parsing(doc, argvs):
+    """Best seconds to parse all `argvs` against `doc`."""
+    parser = Docopt(doc, help=False)
+    return timed(lambda: parse_all(parser, argvs))
+
+
+def fixtures():
+    """(name, doc, argvs) of each fixture of ``testcases.docopt``."""
+    with io.open(os.path.join(ROOT, 'testcases.docopt')) as f:
+        for n, (_, doc, cases) in enumerate(parse_test(f.read()), 1):
+            try:
+                Docopt(doc)
+            except DocoptLanguageError:
+                continue
+            yield ('testcases.docopt/%03d' % n, doc,
+                   [argv for _, argv, _ in cases])
+
+
+def synthetic():
+    """(name, doc, argvs) of grammars that scale."""
+    for n in (100, 1000):
+        last = n // 10 - 1
+        yield ('many_options(%d)' % n, many_options(n),
+               [['cmd%d' % last, '-v', '--opt%d=x' % (n - 1), 'f1', 'f2']])
+    for n in (100, 1000):
+        yield ('many_commands(%d)' % n, many_commands(n),
+               [['cmd%d' % (n - 1), 'a', 'b', '--force']])
+    for n in (10, 100):
+        yield ('deep_nesting(%d)' % n, deep_nesting(n),
+               [['a%d' % i for i in range(n)] + ['c']])
+    for n in (10 ** 4, 10 ** 5):
+        doc, argv = huge_argv(n)
+        yield 'huge_argv(%d)' % n, doc, [argv]
+
+
+def startup(path):
+    """Seconds to run ``python <path> --help``, None if it fails."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(3):
+            start = time.time()
+            if subprocess.call([sys.executable, path, '--help'], env=env,
+                               stdout=devnull, stderr=devnull):
+                return None
+            times.append(time.time() - start)
+    return min(times)
+
+
+def benchmarks():
+    """(name, unit, function measuring it) of each benchmark."""
+    cases = list(fixtures())
+    cases += [('examples/' + name, doc, [argv])
+              for name, doc, argv in linear.argvs(sys.modules['docopt'])]
+    cases += [('synthetic/' + name, doc, argvs)
+              for name, doc, argvs in synthetic()]
+    for name, doc, argvs in cases:
+        yield ('compile/' + name, 's',
+               lambda doc=doc: timed(lambda: Docopt(doc, help=False)))
+        yield ('parse/' + name, 's',
+               lambda doc=doc, argvs=argvs: parsing(doc, argvs))
+    for name, _ in linear.examples():
+        path = os.path.join(ROOT, 'examples', name)
+        yield 'startup/examples/' + name, 's', lambda path=path: startup(path)
+    for name, doc, argvs in synthetic():
+        yield ('memory/synthetic/' + name, 'bytes',
+               lambda doc=doc, argvs=argvs: traced(
+                   lambda: parse_all(Docopt(doc, help=False), argvs)))
+
+
+def run(only=None):
+    results = {}
+    for name, unit, measure in benchmarks():
+        if only and not name.startswith(only):
+            continue
+        value = measure()
+        if value is not None:
+            results[name] = {'value': value, 'unit': unit}
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'benchmarks': results}
+
+
+def compare(saved, current, threshold):
+    """Print a table of results in both runs, return names of regressions."""
+    rows, regressions = [], []
+    for name in sorted(set(saved['benchmarks']) & set(current['benchmarks'])):
+        old = saved['benchmarks'][name]['value']
+        new = current['benchmarks'][name]['value']
+        ratio = new / float(old) if old else float('inf')
+        worse, better = (('bigger', 'smaller') if name.startswith('memory/')
+                         else ('slower', 'faster'))
+        mark = ''
+        if ratio > threshold:
+            mark = worse
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            mark = better
+        rows.append([name, old, new, '%.2f' % ratio, mark])
+    table(['benchmark', 'saved', 'current', 'ratio', ''], rows)
+    print('\n%d of %d benchmarks regressed by more than %.2fx' %
+          (len(regressions), len(rows), threshold))
+    return regressions
+
+
+def main():
+    args = docopt(__doc__)
+    threshold = float(args['--threshold'])
+    results = run(args['--only'])
+    output = args['--output']
+    if output == '-' or output is None and args['--compare'] is None:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print('')
+    elif output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args['--compare'] is not None:
+        with open(args['--compare']) as f:
+            saved = json.load(f)
+        if compare(saved, results, threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Synthetic usage messages for scaling benchmarks."""
+
+
+def independent_groups(n):
+    """Usage with `n` independent `(a | b)` and `[-x | -y]` groups."""
+    commands = ' '.join('(a%d | b%d)' % (i, i) for i in range(n))
+    options = ' '.join('[-x%d | -y%d]' % (i, i) for i in range(n))
+    return 'usage: prog %s %s' % (commands, options)
+
+
+def many_options(n, per_line=10):
+    """Usage with `n` described options, `per_line` of them per line."""
+    usage = ['  prog cmd%d [-v] %s <file>...' % (k, ' '.join(
+        '[--opt%d=<v>]' % i for i in range(k * per_line, (k + 1) * per_line)))
+        for k in range(n // per_line)]
+    options = ['  --opt%d=<v>  Option number %d [default: %d].' % (i, i, i)
+               for i in range(n)]
+    return '\n'.join(['Usage:'] + usage + ['', 'Options:', '  -v  Verbose.'] +
+                     options)
+
+
+def many_commands(n):
+    """Usage with `n` lines, all but every 50th starting with a command."""
+    usage = ['  prog %s [-v] <src> [<dst>] [--force]' %
+             ('cmd%d' % i if i % 50 else '--mode%d=<m>' % i)
+             for i in range(n)]
+    return '\n'.join(['Usage:'] + usage + ['', 'Options:', '  -v  Verbose.',
+                                            '  --force  Force.'])
+
+
+def deep_nesting(n):
+    """Usage with `[a0 (b0 | [a1 (b1 | ...)])]` nested `n` deep."""
+    return 'usage: prog %s' % (
+        ''.join('[a%d (b%d | ' % (i, i) for i in range(n)) + 'c' + ')]' * n)
+
+
+def huge_argv(n):
+    """Usage taking any number of files, and an argv of `n` of them."""
+    return ('usage: prog [-v] [--out=<file>] <file>...',
+            ['-v', '--out=x'] + ['file%d' % i for i in range(n)])
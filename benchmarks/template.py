@@ -0,0 +1,40 @@
+"""Building results: walking the pattern versus copying a template.
+
+Times `Docopt.parse` of short argvs against docs with n options, where
+building the result used to walk every leaf of the pattern on each
+parse.  Run with ``--old <path>`` to also time the docopt module found
+in another checkout, e.g. a ``git worktree`` of an earlier commit.
+
+"""
+import sys
+
+from benchmarks import best, table
+from benchmarks.synthetic import many_options
+
+
+def measure(docopt_module):
+    times = []
+    for n in (10, 100, 1000):
+        parser = docopt_module.Docopt(many_options(n))
+        argv = ['cmd0', '-v', 'f1', 'f2']
+        times.append(best(lambda: parser.parse(argv), 100))
+    return times
+
+
+def main():
+    rows = []
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt', None)
+        import docopt as old
+        rows.append(['old'] + measure(old))
+        sys.path.pop(0)
+        sys.modules.pop('docopt')
+    import docopt
+    rows.append(['new'] + measure(docopt))
+    print('Seconds to parse a short argv against docs with n options:\n')
+    table(['', 'n=10', 'n=100', 'n=1000'], rows)
+
+
+if __name__ == '__main__':
+    main()
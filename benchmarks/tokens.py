@@ -0,0 +1,64 @@
+"""Tokenizing and parsing argv with 10^4 to 10^6 tokens.
+
+Times `parse_argv(Tokens(argv), options)`, which turns argv into option
+and argument patterns before matching.  Run with ``--old <path>`` to
+also time the docopt module found in another checkout, e.g. a ``git
+worktree`` of an earlier commit (only up to 10^5 tokens, as consuming a
+list from the left made it quadratic).
+
+"""
+import sys
+
+from benchmarks import best, table
+
+DOC = """Usage: prog [-v...] [--level=<n>...] <file>...
+
+Options:
+  -v  Verbose.
+  --level=<n>  Level.
+"""
+
+
+def argv(n):
+    return (['-v', 'file', '--level=2', '--level', '3', '-vv', 'x', '-'] *
+            (n // 8))
+
+
+def measure(docopt_module, sizes, limit=None):
+    parser = docopt_module.Docopt(DOC)
+    if hasattr(docopt_module, 'Options'):
+        options = lambda: docopt_module.Options(base=parser.options)
+    else:
+        options = lambda: list(parser.options)
+    times = []
+    for n in sizes:
+        if limit is not None and n > limit:
+            times.append('-')
+            continue
+        tokens = argv(n)
+        times.append(best(lambda: docopt_module.parse_argv(
+            docopt_module.Tokens(tokens), options()), 1, 1))
+    return times
+
+
+def main():
+    sizes = [10 ** 4, 10 ** 5, 10 ** 6]
+    header, columns = ['argv'], []
+    if sys.argv[1:2] == ['--old']:
+        sys.path.insert(0, sys.argv[2])
+        sys.modules.pop('docopt', None)
+        import docopt as old
+        header.append('old')
+        columns.append(measure(old, sizes, limit=10 ** 5))
+        sys.path.pop(0)
+        sys.modules.pop('docopt')
+    import docopt
+    header.append('new' if columns else 'seconds')
+    columns.append(measure(docopt, sizes))
+    print('Seconds to tokenize and parse argv with n tokens:\n')
+    table(header, [[n] + [c[i] for c in columns]
+                   for i, n in enumerate(sizes)])
+
+
+if __name__ == '__main__':
+    main()
@@ -7,10 +7,28 @@
 
 """
 import sys
+import os
 import re
-
-
-__all__ = ['docopt']
+import json
+import time
+import pickle
+import hashlib
+import importlib
+import itertools
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from timeit import default_timer
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+
+# not compile, which would shadow the builtin in `from docopt import *`
+__all__ = ['docopt', 'Docopt', 'CompileCache', 'compile_cache', 'generate',
+           'Memo', 'Subcommands', 'parse_many', 'ParseFailure', 'docopt_cmd',
+           'shell_split', 'Record', 'Profile']
 __version__ = '0.6.2'
 
 
@@ -21,21 +39,66 @@ class DocoptLanguageError(Exception):
 
 class DocoptExit(SystemExit):
 
-    """Exit in case user invoked program with incorrect arguments."""
+    """Exit in case user invoked program with incorrect arguments.
+
+    The message shown is `message` followed by `usage`, which parsers
+    pass themselves rather than setting this class attribute, so that
+    parsing different docs in different threads is safe.
+
+    """
 
     usage = ''
 
-    def __init__(self, message=''):
+    def __init__(self, message='', usage=None):
+        self.message = message
+        if usage is not None:
+            self.usage = usage
         SystemExit.__init__(self, (message + '\n' + self.usage).strip())
 
 
 class Pattern(object):
 
+    """Node of a pattern tree.
+
+    Two nodes are equal if they have the same `repr`, which is decided
+    by comparing their classes and `structure`s instead.
+
+    Nodes are created for every argv token and match, so they have
+    `__slots__` instead of a `__dict__`, and pickle their slots.
+
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name))
+                    for class_ in type(self).__mro__
+                    for name in getattr(class_, '__slots__', ())
+                    if hasattr(self, name))
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __eq__(self, other):
-        return repr(self) == repr(other)
+        return type(self) is type(other) and \
+            self.structure() == other.structure()
 
     def __hash__(self):
-        return hash(repr(self))
+        return hash((type(self), self.structure()))
+
+    def match(self, left, collected=None):
+        """Match list of argv patterns `left`, collecting into `collected`.
+
+        Return (matched, left, collected) with what is left of `left`
+        and what was collected if matched, or the arguments if not.
+
+        """
+        collected = [] if collected is None else collected
+        state = self.match_state(MatchState(Argv(left)))
+        if state is None:
+            return False, left, collected
+        return True, state.left(), state.collected(collected)
 
     def fix(self):
         self.fix_identities()
@@ -43,29 +106,30 @@ class Pattern(object):
         return self
 
     def fix_identities(self, uniq=None):
-        """Make pattern-tree tips point to same object if they are equal."""
+        """Make equal subtrees of pattern-tree point to the same object."""
         if not hasattr(self, 'children'):
             return self
-        uniq = list(set(self.flat())) if uniq is None else uniq
+        uniq = {} if uniq is None else uniq  # subtree -> first equal one
         for i, child in enumerate(self.children):
             if not hasattr(child, 'children'):
-                assert child in uniq
-                self.children[i] = uniq[uniq.index(child)]
+                self.children[i] = uniq.setdefault(child, child)
             else:
                 child.fix_identities(uniq)
+                # children are unique by now, no need to compare them again
+                key = type(child), tuple(id(c) for c in child.children)
+                self.children[i] = uniq.setdefault(key, child)
 
     def fix_repeating_arguments(self):
         """Fix elements that should accumulate/increment values."""
-        either = [list(child.children) for child in transform(self).children]
-        for case in either:
-            for e in [child for child in case if case.count(child) > 1]:
-                if type(e) is Argument or type(e) is Option and e.argcount:
-                    if e.value is None:
-                        e.value = []
-                    elif type(e.value) is not list:
-                        e.value = e.value.split()
-                if type(e) is Command or type(e) is Option and e.argcount == 0:
-                    e.value = 0
+        counts = occurrences(self)
+        for e in [e for e in self.flat() if counts[e] > 1]:
+            if type(e) is Argument or type(e) is Option and e.argcount:
+                if e.value is None:
+                    e.value = []
+                elif type(e.value) is not list:
+                    e.value = e.value.split()
+            if type(e) is Command or type(e) is Option and e.argcount == 0:
+                e.value = 0
         return self
 
 
@@ -96,44 +160,65 @@ def transform(pattern):
     return Either(*[Required(*e) for e in result])
 
 
+def occurrences(pattern):
+    """Count how many times each leaf occurs in one case of `transform`.
+
+    Counts are maximums over all cases (and saturate at 2, which is all
+    `fix_repeating_arguments` needs to know), found bottom-up in linear
+    time instead of expanding the pattern, which is exponential in the
+    number of `Either`s: a sequence adds up the counts of its children,
+    `Either` takes the maximum over its children and `OneOrMore`
+    doubles the counts of its children.
+
+    """
+    if not hasattr(pattern, 'children'):
+        return {pattern: 1}
+    counts = {}
+    for child in pattern.children:
+        for leaf, n in occurrences(child).items():
+            if type(pattern) is Either:
+                counts[leaf] = max(counts.get(leaf, 0), n)
+            else:
+                counts[leaf] = min(counts.get(leaf, 0) + n, 2)
+    if type(pattern) is OneOrMore:
+        counts = dict((leaf, 2) for leaf in counts)
+    return counts
+
+
+def value_structure(value):
+    """Hashable stand-in for `value` that tells e.g. True from 1."""
+    return type(value), tuple(value) if type(value) is list else value
+
+
 class LeafPattern(Pattern):
 
     """Leaf/terminal node of a pattern tree."""
 
+    __slots__ = ('value',)  # and `name`, see subclasses
+
     def __init__(self, name, value=None):
         self.name, self.value = name, value
 
     def __repr__(self):
         return '%s(%r, %r)' % (self.__class__.__name__, self.name, self.value)
 
+    def structure(self):
+        return self.name, value_structure(self.value)
+
     def flat(self, *types):
         return [self] if not types or type(self) in types else []
 
-    def match(self, left, collected=None):
-        collected = [] if collected is None else collected
-        pos, match = self.single_match(left)
-        if match is None:
-            return False, left, collected
-        left_ = left[:pos] + left[pos + 1:]
-        same_name = [a for a in collected if a.name == self.name]
-        if type(self.value) in (int, list):
-            if type(self.value) is int:
-                increment = 1
-            else:
-                increment = ([match.value] if type(match.value) is str
-                             else match.value)
-            if not same_name:
-                match.value = increment
-                return True, left_, collected + [match]
-            same_name[0].value += increment
-            return True, left_, collected
-        return True, left_, collected + [match]
+    def match_state(self, state):
+        index = self.single_match(state)
+        return None if index is None else state.take(self, index)
 
 
 class BranchPattern(Pattern):
 
     """Branch/inner node of a pattern tree."""
 
+    __slots__ = ('children',)
+
     def __init__(self, *children):
         self.children = list(children)
 
@@ -141,19 +226,27 @@ class BranchPattern(Pattern):
         return '%s(%s)' % (self.__class__.__name__,
                            ', '.join(repr(a) for a in self.children))
 
+    def structure(self):
+        return tuple(self.children)
+
     def flat(self, *types):
         if type(self) in types:
             return [self]
-        return sum([child.flat(*types) for child in self.children], [])
+        result = []
+        for child in self.children:
+            result += child.flat(*types)
+        return result
 
 
 class Argument(LeafPattern):
 
-    def single_match(self, left):
-        for n, pattern in enumerate(left):
-            if type(pattern) is Argument:
-                return n, Argument(self.name, pattern.value)
-        return None, None
+    __slots__ = ('name',)
+
+    def single_match(self, state):
+        return state.next_positional()
+
+    def matched(self, pattern):
+        return Argument(self.name, pattern.value)
 
     @classmethod
     def parse(class_, source):
@@ -164,21 +257,25 @@ class Argument(LeafPattern):
 
 class Command(Argument):
 
+    __slots__ = ()
+
     def __init__(self, name, value=False):
         self.name, self.value = name, value
 
-    def single_match(self, left):
-        for n, pattern in enumerate(left):
-            if type(pattern) is Argument:
-                if pattern.value == self.name:
-                    return n, Command(self.name, True)
-                else:
-                    break
-        return None, None
+    def single_match(self, state):
+        n = state.next_positional()
+        if n is not None and state.argv.patterns[n].value == self.name:
+            return n
+        return None
+
+    def matched(self, pattern):
+        return Command(self.name, True)
 
 
 class Option(LeafPattern):
 
+    __slots__ = ('short', 'long', 'argcount')
+
     def __init__(self, short=None, long=None, argcount=0, value=False):
         assert argcount in (0, 1)
         self.short, self.long, self.argcount = short, long, argcount
@@ -201,11 +298,11 @@ class Option(LeafPattern):
             value = matched[0] if matched else None
         return class_(short, long, argcount, value)
 
-    def single_match(self, left):
-        for n, pattern in enumerate(left):
-            if self.name == pattern.name:
-                return n, pattern
-        return None, None
+    def single_match(self, state):
+        return state.next_option(self.name)
+
+    def matched(self, pattern):
+        return pattern
 
     @property
     def name(self):
@@ -215,75 +312,539 @@ class Option(LeafPattern):
         return 'Option(%r, %r, %r, %r)' % (self.short, self.long,
                                            self.argcount, self.value)
 
+    def structure(self):
+        return (self.short, self.long, self.argcount,
+                value_structure(self.value))
+
+
+class Memo(object):
+
+    """Outcomes of matching branches, kept for a single parse.
+
+    Matching a branch depends only on what is left of the argument
+    vector, so with a memo each (branch, state) is matched once, even
+    if equal subpatterns occur in many usage lines or alternatives.
+    Stored matches are counted in `size`; once `limit` is reached no
+    more outcomes are stored.  `hits` and `misses` count lookups.
+
+    """
+
+    def __init__(self, limit=100000):
+        self.limit = limit
+        self.clear()
+
+    def clear(self):
+        self.outcomes = {}
+        self.size = self.hits = self.misses = 0
+
+    def match(self, node, state, match_state):
+        """Outcome of `match_state(state)` for branch `node`, memoized."""
+        key = id(node), state.positionals, state.options
+        if key in self.outcomes:
+            self.hits += 1
+            outcome = self.outcomes[key]
+            if outcome is None:
+                return None
+            positionals, options, left_count, matches = outcome
+            node = state.matches
+            for leaf, n in matches:
+                node = leaf, n, node
+            return MatchState(state.argv, positionals, options, node,
+                              left_count)
+        self.misses += 1
+        result = match_state(state)
+        matches = []
+        node = state.matches if result is None else result.matches
+        while node is not state.matches:
+            leaf, n, node = node
+            matches.append((leaf, n))
+        if self.size + len(matches) + 1 <= self.limit:
+            self.size += len(matches) + 1
+            self.outcomes[key] = None if result is None else (
+                result.positionals, result.options, result.left_count,
+                tuple(reversed(matches)))
+        return result
+
+    def __repr__(self):
+        return 'Memo(limit=%r, size=%d, hits=%d, misses=%d)' % (
+            self.limit, self.size, self.hits, self.misses)
+
+
+def memoized(match_state):
+    """Decorate `match_state` of a branch to use memo of argv, if any."""
+    def wrapper(self, state):
+        memo = state.argv.memo
+        if memo is None:
+            return match_state(self, state)
+        return memo.match(self, state, lambda state: match_state(self, state))
+    wrapper.__name__ = match_state.__name__
+    wrapper.__doc__ = match_state.__doc__
+    return wrapper
+
 
 class Required(BranchPattern):
 
-    def match(self, left, collected=None):
-        collected = [] if collected is None else collected
-        l = left
-        c = collected
+    __slots__ = ()
+
+    def match_state(self, state):
         for pattern in self.children:
-            matched, l, c = pattern.match(l, c)
-            if not matched:
-                return False, left, collected
-        return True, l, c
+            state = pattern.match_state(state)
+            if state is None:
+                return None
+        return state
 
 
 class Optional(BranchPattern):
 
-    def match(self, left, collected=None):
-        collected = [] if collected is None else collected
+    __slots__ = ()
+
+    @memoized
+    def match_state(self, state):
         for pattern in self.children:
-            m, left, collected = pattern.match(left, collected)
-        return True, left, collected
+            state = pattern.match_state(state) or state
+        return state
 
 
 class OptionsShortcut(Optional):
 
     """Marker/placeholder for [options] shortcut."""
 
+    __slots__ = ()
+
 
 class OneOrMore(BranchPattern):
 
-    def match(self, left, collected=None):
+    __slots__ = ()
+
+    @memoized
+    def match_state(self, state):
         assert len(self.children) == 1
-        collected = [] if collected is None else collected
-        l = left
-        c = collected
-        l_ = None
-        matched = True
+        if type(self.children[0]) is Argument:  # takes all positionals left
+            if state.next_positional() is None:
+                return None
+            return state.take_positionals(self.children[0])
         times = 0
-        while matched:
-            # could it be that something didn't match but changed l or c?
-            matched, l, c = self.children[0].match(l, c)
-            times += 1 if matched else 0
-            if l_ == l:
+        while True:
+            matched = self.children[0].match_state(state)
+            if matched is None:
                 break
-            l_ = l
-        if times >= 1:
-            return True, l, c
-        return False, left, collected
+            times += 1
+            if matched.left_count == state.left_count:  # nothing consumed
+                break
+            state = matched
+        return state if times >= 1 else None
 
 
 class Either(BranchPattern):
 
-    def match(self, left, collected=None):
-        collected = [] if collected is None else collected
+    __slots__ = ()
+
+    @memoized
+    def match_state(self, state):
         outcomes = []
         for pattern in self.children:
-            matched, _, _ = outcome = pattern.match(left, collected)
-            if matched:
+            outcome = pattern.match_state(state)
+            if outcome is not None:
                 outcomes.append(outcome)
         if outcomes:
-            return min(outcomes, key=lambda outcome: len(outcome[1]))
-        return False, left, collected
+            return min(outcomes, key=lambda outcome: outcome.left_count)
+        return None
+
+
+def matcher(pattern, names, matchers=None):
+    """Compile `pattern` into a function equivalent to its `match_state`.
+
+    The function works on states of `Argv`s indexed with option `names`
+    (e.g. `option_ids(pattern)`).  Each node becomes a closure that
+    knows its children and, for leaves, which kind of argument and
+    which option index to look at, so matching does no dispatch on
+    types or names.  Equal subpatterns are compiled once.
+
+    """
+    matchers = {} if matchers is None else matchers
+    if id(pattern) in matchers:
+        return matchers[id(pattern)]
+    children = [matcher(child, names, matchers)
+                for child in getattr(pattern, 'children', [])]
+
+    def memoizing(match):
+        def memoized(state):
+            memo = state.argv.memo
+            return match(state) if memo is None else \
+                memo.match(pattern, state, match)
+        return memoized
+
+    if type(pattern) is Option:
+        i = names[pattern.name]
+
+        def match(state):
+            if state.options[i] < len(state.argv.options[i]):
+                return state.take_option(pattern, i)
+            return None
+    elif type(pattern) is Command:
+        name = pattern.name
+
+        def match(state):
+            argv, n = state.argv, state.positionals
+            if n < len(argv.positionals) and \
+                    argv.patterns[argv.positionals[n]].value == name:
+                return state.take_positional(pattern)
+            return None
+    elif type(pattern) is Argument:
+        def match(state):
+            if state.positionals < len(state.argv.positionals):
+                return state.take_positional(pattern)
+            return None
+    elif type(pattern) is Required and len(children) == 1:
+        match = children[0]
+    elif type(pattern) is Required:
+        def match(state):
+            for child in children:
+                state = child(state)
+                if state is None:
+                    return None
+            return state
+    elif type(pattern) in (Optional, OptionsShortcut):
+        def match(state):
+            for child in children:
+                state = child(state) or state
+            return state
+        match = memoizing(match)
+    elif type(pattern) is OneOrMore and type(pattern.children[0]) is Argument:
+        def match(state):
+            if state.positionals < len(state.argv.positionals):
+                return state.take_positionals(pattern.children[0])
+            return None
+        match = memoizing(match)
+    elif type(pattern) is OneOrMore:
+        child, = children
+
+        def match(state):
+            times = 0
+            while True:
+                matched = child(state)
+                if matched is None:
+                    break
+                times += 1
+                if matched.left_count == state.left_count:
+                    break
+                state = matched
+            return state if times >= 1 else None
+        match = memoizing(match)
+    elif type(pattern) is Either:
+        # alternatives that can match, by value of next positional argument
+        table, fallback, empty = {}, [], []
+        for n, (names, nullable) in enumerate(map(leads, pattern.children)):
+            if names is None or nullable:
+                fallback.append(n)
+            else:
+                for name in names:
+                    table.setdefault(name, []).append(n)
+            if nullable:
+                empty.append(n)
+        table = dict((name, [children[n] for n in sorted(set(ns + fallback))])
+                     for name, ns in table.items())
+        fallback = [children[n] for n in fallback]
+        empty = [children[n] for n in empty]
+
+        def match(state):
+            argv, n = state.argv, state.positionals
+            if n < len(argv.positionals):
+                value = argv.patterns[argv.positionals[n]].value
+                candidates = table.get(value, fallback)
+            else:
+                candidates = empty
+            best = None
+            for child in candidates:
+                outcome = child(state)
+                if outcome is not None and (
+                        best is None or outcome.left_count < best.left_count):
+                    best = outcome
+            return best
+        match = memoizing(match)
+    else:
+        raise TypeError('cannot compile %r' % pattern)
+    matchers[id(pattern)] = match
+    return match
+
+
+def leads(pattern):
+    """Which positional argument `pattern` can start matching with.
+
+    Return (names, nullable): `pattern` can only take positional
+    arguments if the first of them is one of the commands `names` (None
+    if it can be any argument), and only match without taking any if
+    `nullable`.  Options take no positional arguments, so they do not
+    change which one comes first.
+
+    """
+    if type(pattern) is Option:
+        return set(), True
+    elif type(pattern) is Command:
+        return set([pattern.name]), False
+    elif type(pattern) is Argument:
+        return None, False
+    names, nullable = set(), type(pattern) is not Either
+    for child in pattern.children:
+        child_names, child_nullable = leads(child)
+        names = None if None in (names, child_names) else \
+            names | child_names
+        if type(pattern) is Either:
+            nullable = nullable or child_nullable
+        elif type(pattern) in (Required, OneOrMore) and not child_nullable:
+            return names, False  # takes a positional argument first
+    return names, nullable
+
+
+def linear(pattern, index):
+    """Single-pass matcher of `pattern` if it is linear, else None.
+
+    A pattern is linear if it has no alternatives (`Either` of more than
+    one child) and no repetitions (`OneOrMore`, or leaves that occur
+    more than once), as a single usage line with no "|" and no "...".
+    Then matching never has anything to try again: positional arguments
+    fill the `Argument` and `Command` leaves in order, each `Option`
+    takes the option of its name if there is one, and a required group
+    that fails takes nothing.
+
+    The function takes an argv (list of patterns) and returns what the
+    leaves took as (position in `index`, value) pairs, or None if the
+    pattern does not match all of argv, just as `matcher` would.
+
+    """
+    leaves = pattern.flat()
+    if len(set(leaf.name for leaf in leaves)) < len(leaves):
+        return None
+
+    def compiled(pattern):
+        children = [compiled(child)
+                    for child in getattr(pattern, 'children', [])]
+        if None in children:
+            return None
+        if type(pattern) is Option:
+            name, i = pattern.name, index[pattern.name]
+
+            def match(positionals, options, n, taken):
+                if name in options:
+                    taken.append((i, options[name].value))
+                    return n
+                return None
+        elif type(pattern) is Command:
+            name, i = pattern.name, index[pattern.name]
+
+            def match(positionals, options, n, taken):
+                if n < len(positionals) and positionals[n] == name:
+                    taken.append((i, True))
+                    return n + 1
+                return None
+        elif type(pattern) is Argument:
+            i = index[pattern.name]
+
+            def match(positionals, options, n, taken):
+                if n < len(positionals):
+                    taken.append((i, positionals[n]))
+                    return n + 1
+                return None
+        elif type(pattern) is Required or \
+                type(pattern) is Either and len(children) == 1:
+            def match(positionals, options, n, taken):
+                mark = len(taken)
+                for child in children:
+                    n = child(positionals, options, n, taken)
+                    if n is None:
+                        del taken[mark:]
+                        return None
+                return n
+        elif type(pattern) in (Optional, OptionsShortcut):
+            def match(positionals, options, n, taken):
+                for child in children:
+                    matched = child(positionals, options, n, taken)
+                    n = n if matched is None else matched
+                return n
+        else:
+            return None
+        return match
+
+    top = compiled(pattern)
+    if top is None:
+        return None
+
+    def match(argv):
+        positionals, options = [], {}
+        for p in argv:
+            if type(p) is Argument:
+                positionals.append(p.value)
+            else:
+                options[p.name] = p
+        taken = []
+        n = top(positionals, options, 0, taken)
+        # each leaf takes one pattern, so all are taken if as many leaves
+        if n is None or len(taken) < len(argv):
+            return None
+        return taken
+    return match
+
+
+def option_ids(pattern):
+    """Map names of options in `pattern` to consecutive indices."""
+    names = {}
+    for option in pattern.flat(Option):
+        names.setdefault(option.name, len(names))
+    return names
+
+
+class Argv(object):
+
+    """Argument vector (list of patterns) indexed for matching.
+
+    Leaves only ever take the first positional argument left, or the
+    first option left with their name, so what is left of an `Argv`
+    is described by how many positional arguments and how many options
+    of each name were taken.  `memo` is the `Memo` to use, if any.
+
+    `names` maps option names to their indices in `options`; by default
+    they are numbered in order of appearance.  If given, options with
+    other names are not indexed, as nothing can take them anyway.
+
+    """
+
+    def __init__(self, patterns, memo=None, names=None):
+        self.patterns, self.memo = list(patterns), memo
+        self.positionals = []  # indices of positional arguments
+        self.names = {} if names is None else names
+        self.options = [[] for _ in self.names]  # indices of options
+        for n, pattern in enumerate(self.patterns):
+            if type(pattern) is Argument:
+                self.positionals.append(n)
+            elif type(pattern) is Option:
+                if pattern.name not in self.names:
+                    if names is not None:
+                        continue
+                    self.names[pattern.name] = len(self.options)
+                    self.options.append([])
+                self.options[self.names[pattern.name]].append(n)
+
 
+class MatchState(object):
 
-class Tokens(list):
+    """Immutable state of matching an `Argv`.
+
+    Holds the numbers of positional arguments and options (per name)
+    taken so far, and the matches so far as a linked list of
+    (leaf, index into argv, previous) that all later states share, so
+    taking a pattern copies no lists.  A leaf that takes all positional
+    arguments left at once is matched to (start, stop) of `positionals`
+    instead of an index.  `collected` turns the matches into the list
+    of patterns `Pattern.match` collects.
+
+    """
+
+    def __init__(self, argv, positionals=0, options=None, matches=None,
+                 left_count=None):
+        self.argv, self.positionals, self.matches = argv, positionals, matches
+        self.options = (0,) * len(argv.options) if options is None else options
+        self.left_count = (len(argv.patterns) if left_count is None
+                           else left_count)
+
+    def next_positional(self):
+        if self.positionals < len(self.argv.positionals):
+            return self.argv.positionals[self.positionals]
+        return None
+
+    def next_option(self, name):
+        i = self.argv.names.get(name)
+        if i is not None and self.options[i] < len(self.argv.options[i]):
+            return self.argv.options[i][self.options[i]]
+        return None
+
+    def take(self, leaf, n):
+        """New state with `leaf` matched to argv pattern number `n`."""
+        if type(self.argv.patterns[n]) is Option:
+            return self.take_option(leaf, self.argv.names[leaf.name])
+        return self.take_positional(leaf)
+
+    def take_positional(self, leaf):
+        n = self.argv.positionals[self.positionals]
+        return MatchState(self.argv, self.positionals + 1, self.options,
+                          (leaf, n, self.matches), self.left_count - 1)
+
+    def take_positionals(self, leaf):
+        """New state with `leaf` matched to all positional arguments left."""
+        start, stop = self.positionals, len(self.argv.positionals)
+        return MatchState(self.argv, stop, self.options,
+                          (leaf, (start, stop), self.matches),
+                          self.left_count - (stop - start))
+
+    def take_option(self, leaf, i):
+        options = self.options
+        n = self.argv.options[i][options[i]]
+        options = options[:i] + (options[i] + 1,) + options[i + 1:]
+        return MatchState(self.argv, self.positionals, options,
+                          (leaf, n, self.matches), self.left_count - 1)
+
+    def left(self):
+        """List of argv patterns not taken, in their original order."""
+        argv = self.argv
+        taken = set(argv.positionals[:self.positionals])
+        for indices, count in zip(argv.options, self.options):
+            taken.update(indices[:count])
+        return [p for n, p in enumerate(argv.patterns) if n not in taken]
+
+    def collected(self, collected=None):
+        """Patterns collected by the matches, appended to `collected`."""
+        matches, node = [], self.matches
+        while node is not None:
+            leaf, n, node = node
+            matches.append((leaf, n))
+        collected = [] if collected is None else list(collected)
+        patterns, positionals = self.argv.patterns, self.argv.positionals
+        first = {}  # name -> first pattern collected with that name
+        for pattern in collected:
+            first.setdefault(pattern.name, pattern)
+        for leaf, n in reversed(matches):
+            if type(n) is tuple:
+                taken = [patterns[i] for i in positionals[n[0]:n[1]]]
+            else:
+                taken = [patterns[n]]
+            if type(leaf.value) not in (int, list):
+                for p in taken:
+                    match = leaf.matched(p)
+                    first.setdefault(match.name, match)
+                    collected.append(match)
+                continue
+            if type(leaf.value) is int:
+                increment = len(taken)
+            elif type(n) is tuple:  # an Argument keeps the values of argv
+                increment = [p.value for p in taken]
+            else:
+                increment = []
+                for p in taken:
+                    value = leaf.matched(p).value
+                    increment += [value] if type(value) is str else value
+            if leaf.name in first:
+                first[leaf.name].value += increment
+            else:
+                match = leaf.matched(taken[0])
+                match.value = increment
+                first[match.name] = match
+                collected.append(match)
+        return collected
+
+
+class Tokens(deque):
+
+    """Stream of tokens, consumed from the left in constant time.
+
+    Each token is classified once, when the stream is created; `kind`
+    tells what the current one is (see `token_kind`).
+
+    """
 
     def __init__(self, source, error=DocoptExit):
-        self += source.split() if hasattr(source, 'split') else source
+        deque.__init__(self, source.split() if hasattr(source, 'split')
+                       else source)
         self.error = error
+        self.kinds = deque(map(token_kind, self))
 
     @staticmethod
     def from_pattern(source):
@@ -292,10 +853,128 @@ class Tokens(list):
         return Tokens(source, error=DocoptLanguageError)
 
     def move(self):
-        return self.pop(0) if len(self) else None
+        if not self:
+            return None
+        self.kinds.popleft()
+        return self.popleft()
 
     def current(self):
-        return self[0] if len(self) else None
+        return self[0] if self else None
+
+    def kind(self):
+        return self.kinds[0] if self else None
+
+
+def token_kind(token):
+    """Kind of argv `token`: '--', 'long', 'shorts' or 'argument'."""
+    if token == '--':
+        return '--'
+    elif token.startswith('--'):
+        return 'long'
+    elif token.startswith('-') and token != '-':
+        return 'shorts'
+    return 'argument'
+
+
+class Options(list):
+
+    """List of `Option`s indexed by name for `parse_long`/`parse_shorts`.
+
+    Options are found by short or long name with a dict lookup, and by
+    a prefix of their long name with a table of all such prefixes (a
+    flattened trie), in the order of the list.  `append` keeps the index
+    up to date, and also appends to `mirror`, if given.  Lookups see the
+    options of `base` first, so that parsing an argv can add options to
+    an overlay without copying or re-indexing the options of a doc.
+
+    """
+
+    def __init__(self, options=(), base=None, mirror=None):
+        list.__init__(self)
+        self.base, self.mirror = base, None
+        self.shorts, self.longs, self.prefixes = {}, {}, {}
+        self.extend(options)
+        self.mirror = mirror
+
+    def append(self, option):
+        list.append(self, option)
+        if self.mirror is not None:
+            self.mirror.append(option)
+        if option.short:
+            self.shorts.setdefault(option.short, []).append(option)
+        if option.long:
+            self.longs.setdefault(option.long, []).append(option)
+            for i in range(1, len(option.long) + 1):
+                self.prefixes.setdefault(option.long[:i], []).append(option)
+
+    def extend(self, options):
+        for option in options:
+            self.append(option)
+
+    def __iadd__(self, options):
+        self.extend(options)
+        return self
+
+    def __reduce__(self):
+        return Options, (list(self), self.base)
+
+    def lookup(self, table, key):
+        found = [] if self.base is None else self.base.lookup(table, key)
+        return found + getattr(self, table).get(key, [])
+
+    def short(self, short):
+        """Options named `short`."""
+        return self.lookup('shorts', short)
+
+    def long(self, long):
+        """Options named `long`."""
+        return self.lookup('longs', long)
+
+    def prefix(self, prefix):
+        """Options with a long name that starts with `prefix`."""
+        return self.lookup('prefixes', prefix)
+
+
+def indexed(options):
+    """`options` as `Options`: a plain list is indexed anew, and options
+    appended to the index are appended to it as well."""
+    if isinstance(options, Options):
+        return options
+    return Options(options, mirror=options)
+
+
+SHELL_WORD = re.compile(r'''(\s+)|([^\s'"\\]+)|'([^']*)'|"((?:[^"\\]|\\.)*)"'''
+                        r'''|\\(.)|(.)''', re.S)
+
+
+def shell_split(line):
+    """Split `line` into words like a POSIX shell (and `shlex.split`).
+
+    Quotes and backslashes are handled by a scan with one regular
+    expression instead of shlex's character-by-character state machine,
+    and lines without them are simply split on whitespace.
+
+    """
+    if not ('"' in line or "'" in line or '\\' in line):
+        return line.split()
+    words, word = [], None
+    for match in SHELL_WORD.finditer(line):
+        space, bare, single, double, escaped, stray = match.groups()
+        if space:
+            if word is not None:
+                words.append(word)
+            word = None
+        elif stray:
+            rest = line[match.end():]
+            if stray == '\\' or stray == '"' and \
+                    re.match(r'(?:[^"\\]|\\.)*\\\Z', rest, re.S):
+                raise ValueError('No escaped character')
+            raise ValueError('No closing quotation')
+        elif double is not None:
+            word = (word or '') + re.sub(r'\\(["\\])', r'\1', double)
+        else:
+            word = (word or '') + (bare or single or escaped or '')
+    return words if word is None else words + [word]
 
 
 def parse_long(tokens, options):
@@ -303,9 +982,9 @@ def parse_long(tokens, options):
     long, eq, value = tokens.move().partition('=')
     assert long.startswith('--')
     value = None if eq == value == '' else value
-    similar = [o for o in options if o.long == long]
+    similar = indexed(options).long(long)
     if tokens.error is DocoptExit and similar == []:  # if no exact match
-        similar = [o for o in options if o.long and o.long.startswith(long)]
+        similar = indexed(options).prefix(long)
     if len(similar) > 1:  # might be simply specified ambiguously 2+ times?
         raise tokens.error('%s is not a unique prefix: %s?' %
                            (long, ', '.join(o.long for o in similar)))
@@ -339,7 +1018,7 @@ def parse_shorts(tokens, options):
     parsed = []
     while left != '':
         short, left = '-' + left[0], left[1:]
-        similar = [o for o in options if o.short == short]
+        similar = indexed(options).short(short)
         if len(similar) > 1:
             raise tokens.error('%s is specified ambiguously %d times' %
                                (short, len(similar)))
@@ -368,6 +1047,7 @@ def parse_shorts(tokens, options):
 
 def parse_pattern(source, options):
     tokens = Tokens.from_pattern(source)
+    options = indexed(options)  # once, not for each option
     result = parse_expr(tokens, options)
     if tokens.current() is not None:
         raise tokens.error('unexpected ending: %r' % ' '.join(tokens))
@@ -434,13 +1114,15 @@ def parse_argv(tokens, options, options_first=False):
         argv ::= [ long | shorts | argument ]* [ '--' [ argument ]* ] ;
 
     """
+    options = indexed(options)  # once, not for each option
     parsed = []
-    while tokens.current() is not None:
-        if tokens.current() == '--':
+    while tokens:
+        kind = tokens.kind()
+        if kind == '--':
             return parsed + [Argument(None, v) for v in tokens]
-        elif tokens.current().startswith('--'):
+        elif kind == 'long':
             parsed += parse_long(tokens, options)
-        elif tokens.current().startswith('-') and tokens.current() != '-':
+        elif kind == 'shorts':
             parsed += parse_shorts(tokens, options)
         elif options_first:
             return parsed + [Argument(None, v) for v in tokens]
@@ -487,7 +1169,575 @@ class Dict(dict):
         return '{%s}' % ',\n '.join('%r: %r' % i for i in sorted(self.items()))
 
 
-def docopt(doc, argv=None, help=True, version=None, options_first=False):
+class Layout(object):
+
+    """Names of a parser's results, shared by all its `Record`s."""
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.index = dict((name, i) for i, name in enumerate(self.names))
+        self.attributes = {}  # e.g. 'dry_run' for '--dry-run'
+        for i, name in enumerate(self.names):
+            self.attributes.setdefault(re.sub(r'\W', '_', name.strip('-<>')),
+                                       i)
+
+    def __reduce__(self):
+        return Layout, (self.names,)
+
+    def __repr__(self):
+        return 'Layout(%r)' % (self.names,)
+
+
+class Record(Mapping):
+
+    """Result of a parse as a tuple of values in the order of a `Layout`.
+
+    Much smaller than a `Dict`, as the names are stored once per parser
+    (and once per pickle of many records).  Values can be looked up by
+    name, like in a dict, or as attributes named after them, e.g.
+    `record.dry_run` for `record['--dry-run']`.
+
+    """
+
+    __slots__ = ('_layout', '_values')  # not to hide names or methods
+
+    def __init__(self, layout, values):
+        self._layout, self._values = layout, tuple(values)
+
+    def __getitem__(self, name):
+        return self._values[self._layout.index[name]]
+
+    def __getattr__(self, attribute):
+        try:
+            return self._values[self._layout.attributes[attribute]]
+        except (KeyError, AttributeError):  # (no layout while unpickling)
+            raise AttributeError(attribute)
+
+    def __iter__(self):
+        return iter(self._layout.names)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __reduce__(self):
+        return Record, (self._layout, self._values)
+
+    def __repr__(self):
+        return '{%s}' % ',\n '.join('%r: %r' % i for i in sorted(self.items()))
+
+
+class Profile(object):
+
+    """Wall time and number of calls of each phase of compiling and parsing.
+
+    Pass one as `profile` to `Docopt`, `Docopt.parse`, `compile` or
+    `docopt` to time their `phases` into it; nothing is timed without
+    it.  `docopt` makes its own if $DOCOPT_PROFILE is set, and appends
+    its `record` to the JSON-lines file named by it.  Parsers that come
+    from a cache are not compiled again, so compiling phases then take
+    no calls.
+
+    """
+
+    phases = ('parse_section', 'parse_defaults', 'parse_pattern', 'fix',
+              'parse_argv', 'match')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.calls = dict.fromkeys(self.phases, 0)
+        self.seconds = dict.fromkeys(self.phases, 0.0)
+
+    def time(self, phase, func, *args):
+        """`func(*args)`, timed as one more call of `phase`."""
+        start = default_timer()
+        try:
+            return func(*args)
+        finally:
+            self.seconds[phase] += default_timer() - start
+            self.calls[phase] += 1
+
+    def record(self, **fields):
+        """Calls and seconds of each phase, and `fields`, as JSON does."""
+        record = dict(fields)
+        record['phases'] = dict((phase, {'calls': self.calls[phase],
+                                         'seconds': self.seconds[phase]})
+                                for phase in self.phases)
+        return record
+
+    def write(self, path, **fields):
+        """Append `record(**fields)` to the file `path` as a JSON line."""
+        line = json.dumps(self.record(**fields), sort_keys=True) + '\n'
+        with open(path, 'a') as f:
+            f.write(line)
+
+    def __repr__(self):
+        return 'Profile(%s)' % ', '.join(
+            '%s=%d/%.6fs' % (phase, self.calls[phase], self.seconds[phase])
+            for phase in self.phases)
+
+
+def timed(profile, phase, func, *args):
+    """`func(*args)`, timed by `profile` unless it is None."""
+    if profile is None:
+        return func(*args)
+    return profile.time(phase, func, *args)
+
+
+class Docopt(object):
+
+    """Command-line interface compiled from its description `doc`.
+
+    Everything that depends only on `doc` (usage section, option
+    defaults, pattern tree) is computed once in the constructor, so
+    one instance can `parse` any number of argument vectors.  Matching
+    never mutates the compiled pattern tree.
+
+    `engine` is 'compiled' to match with the functions built by
+    `matcher`, or 'tree' to walk the pattern tree; both give the same
+    results.  Compiling is timed into `profile`, if given.
+
+    """
+
+    engines = ('compiled', 'tree')
+
+    def __init__(self, doc, help=True, options_first=False,
+                 engine='compiled', profile=None):
+        if engine not in self.engines:
+            raise ValueError('engine must be one of %s, not %r' %
+                             (', '.join(self.engines), engine))
+        usage_sections = timed(profile, 'parse_section',
+                               parse_section, 'usage:', doc)
+        if len(usage_sections) == 0:
+            raise DocoptLanguageError('"usage:" (case-insensitive) not found.')
+        if len(usage_sections) > 1:
+            raise DocoptLanguageError('More than one "usage:" '
+                                      '(case-insensitive).')
+        self.doc, self.help, self.options_first = doc, help, options_first
+        self.engine = engine
+        self.usage = usage_sections[0]
+        self.options = Options(timed(profile, 'parse_defaults',
+                                     parse_defaults, doc))
+        self.pattern = timed(profile, 'parse_pattern', parse_pattern,
+                             formal_usage(self.usage), self.options)
+        # [default] syntax for argument is disabled
+        #for a in pattern.flat(Argument):
+        #    same_name = [d for d in arguments if d.name == a.name]
+        #    if same_name:
+        #        a.value = same_name[0].value
+        pattern_options = set(self.pattern.flat(Option))
+        for options_shortcut in self.pattern.flat(OptionsShortcut):
+            doc_options = timed(profile, 'parse_defaults',
+                                parse_defaults, doc)
+            options_shortcut.children = [o for o in OrderedDict.fromkeys(
+                doc_options) if o not in pattern_options]
+            #if any_options:
+            #    options_shortcut.children += [Option(o.short, o.long,
+            #                        o.argcount) for o in argv
+            #                        if type(o) is Option]
+        timed(profile, 'fix', self.pattern.fix)
+        self.names = option_ids(self.pattern)
+        # template of results: default of each name (the last one in
+        # the pattern wins) and which of them are lists to copy
+        defaults = OrderedDict()
+        for leaf in self.pattern.flat():
+            defaults[leaf.name] = leaf.value
+        self.layout = Layout(defaults)
+        self.defaults = tuple(defaults.values())
+        self.lists = [i for i, value in enumerate(self.defaults)
+                      if type(value) is list]
+        self.match_state, self.match_linear = self.matchers()
+
+    def matchers(self):
+        """Function that matches a `MatchState`, as chosen by `engine`,
+        and the `linear` one to use instead (None if there is none)."""
+        if self.engine == 'tree':
+            return self.pattern.match_state, None
+        return (matcher(self.pattern, self.names),
+                linear(self.pattern, self.layout.index))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['match_state'], state['match_linear']  # closures
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.match_state, self.match_linear = self.matchers()
+
+    def parse(self, argv=None, version=None, memo=None, record=False,
+              profile=None):
+        """Parse `argv` (sys.argv[1:] by default), see `docopt`.
+
+        `argv` may also be `Tokens`, which are used as they are.  With
+        `options_first`, the tokens from the first positional argument
+        on are left in them (see `Subcommands`).
+
+        Pass a `Memo` as `memo` to memoize outcomes of matching
+        branches; it is cleared first and tells how often it was hit.
+        With `record`, return a compact `Record` instead of a `Dict`.
+        Parsing is timed into `profile`, if given.
+
+        """
+        argv = sys.argv[1:] if argv is None else argv
+        tokens = argv if isinstance(argv, Tokens) else Tokens(argv)
+        try:
+            argv = timed(profile, 'parse_argv', parse_argv, tokens,
+                         Options(base=self.options), self.options_first)
+        except DocoptExit as e:  # raised without our usage
+            raise DocoptExit(e.message, self.usage)
+        extras(self.help, version, argv, self.doc)
+        if memo is not None:
+            memo.clear()
+        taken = timed(profile, 'match', self.match, argv, memo)
+        if taken is None:
+            # better error message if something is left?
+            raise DocoptExit(usage=self.usage)
+        # list values collected are new, those of the template are
+        # shared by all parses
+        values = list(self.defaults)
+        for i in self.lists:
+            values[i] = list(values[i])
+        for i, value in taken:
+            values[i] = value
+        if record:
+            return Record(self.layout, values)
+        return Dict(zip(self.layout.names, values))
+
+    def match(self, argv, memo=None):
+        """What leaves take of `argv` (list of patterns) as (position in
+        `layout`, value) pairs, or None if it does not match."""
+        if self.match_linear is not None:
+            return self.match_linear(argv)
+        state = self.match_state(MatchState(Argv(argv, memo, self.names)))
+        if state is None or state.left_count:
+            return None
+        index = self.layout.index
+        return [(index[leaf.name], leaf.value) for leaf in state.collected()]
+
+    def __repr__(self):
+        return 'Docopt(%r)' % self.usage
+
+
+def compile(doc, help=True, options_first=False, cache_dir=None,
+            engine='compiled', profile=None):
+    """Compile `doc` into a `Docopt` parser, reusable across `argv`s.
+
+    If `cache_dir` (default: $DOCOPT_CACHE_DIR, if set) is given, the
+    compiled parser is also pickled there and loaded by later processes
+    instead of being compiled again; `True` means the per-user cache
+    directory ($XDG_CACHE_HOME/docopt).  Only use directories that are
+    not writable by others, as cache files are unpickled.  See `Docopt`
+    for `engine` and `profile`.
+
+    >>> parser = compile('usage: prog [-v] <file>')
+    >>> parser.parse(['-v', 'a.txt']) == {'-v': True, '<file>': 'a.txt'}
+    True
+
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('DOCOPT_CACHE_DIR')
+    if not cache_dir:
+        return Docopt(doc, help, options_first, engine, profile)
+    if cache_dir is True:
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                                 os.path.join(os.path.expanduser('~'),
+                                              '.cache'), 'docopt')
+    path = os.path.join(cache_dir,
+                        cache_key(doc, help, options_first, engine))
+    try:
+        with open(path, 'rb') as f:
+            parser = pickle.load(f)
+        if (parser.doc, parser.help, parser.options_first,
+                parser.engine) == (doc, help, options_first, engine):
+            return parser
+    except Exception:  # missing, stale or corrupt: compile it again
+        pass
+    parser = Docopt(doc, help, options_first, engine, profile)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(parser, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, path)  # readers never see half-written files
+    except (IOError, OSError):  # caching is best-effort
+        pass
+    return parser
+
+
+def cache_key(doc, help=True, options_first=False, engine='compiled'):
+    """Stable file name for the on-disk cache of a compiled `doc`."""
+    key = '\0'.join([__version__, '%d.%d' % sys.version_info[:2],
+                     repr(bool(help)), repr(bool(options_first)), engine,
+                     doc])
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+    return 'docopt-%s.pickle' % hashlib.sha1(key).hexdigest()
+
+
+class CompileCache(object):
+
+    """Thread-safe LRU cache of `Docopt` parsers used by `docopt()`.
+
+    Parsers are keyed on `doc` and the flags that affect compilation
+    (`help`, `options_first`).  Set `maxsize` with `resize` (0 disables
+    caching); `hits`, `misses` and `evictions` count lookups.
+
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = self.misses = self.evictions = 0
+        self._parsers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, doc, help=True, options_first=False, profile=None):
+        key = (doc, help, options_first)
+        with self._lock:
+            parser = self._parsers.pop(key, None)
+            if parser is not None:
+                self._parsers[key] = parser  # most recently used goes last
+                self.hits += 1
+                return parser
+            self.misses += 1
+        parser = compile(doc, help, options_first, profile=profile)
+        if self.maxsize > 0:
+            with self._lock:
+                self._parsers[key] = parser
+                self._evict()
+        return parser
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._parsers.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def _evict(self):
+        while self._parsers and len(self._parsers) > self.maxsize:
+            self._parsers.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._parsers)
+
+    def __repr__(self):
+        return ('CompileCache(maxsize=%r, size=%d, hits=%d, misses=%d, '
+                'evictions=%d)' % (self.maxsize, len(self), self.hits,
+                                   self.misses, self.evictions))
+
+
+compile_cache = CompileCache()
+
+
+class Subcommands(object):
+
+    """Command-line interface with subcommands that have their own docs.
+
+    `doc` describes the global options and ends with the command and
+    its arguments, e.g. `usage: prog [options] <command> [<args>...]`;
+    it is parsed with `options_first`.  Docs of subcommands are
+    registered with `add` and only imported and compiled when their
+    command is invoked, so start-up time does not depend on how many
+    there are.
+
+    >>> cli = Subcommands('usage: prog [-v] <command> [<args>...]')
+    >>> cli.add('get', 'usage: prog get <key>')
+    >>> args, command, command_args = cli.parse(['-v', 'get', 'x'])
+    >>> command, command_args == {'get': True, '<key>': 'x'}
+    ('get', True)
+
+    """
+
+    def __init__(self, doc, help=True, version=None, command='<command>'):
+        self.doc, self.help, self.version = doc, help, version
+        self.command = command
+        self.commands = {}  # name -> (doc, module, options_first)
+
+    def add(self, name, doc=None, module=None, options_first=False):
+        """Register command `name` described by `doc`, or by the
+        docstring of `module` (imported when `name` is invoked)."""
+        if (doc is None) == (module is None):
+            raise ValueError('pass either doc or module for %r' % name)
+        self.commands[name] = doc, module, options_first
+
+    def parser(self, name):
+        """Compiled parser of command `name`."""
+        doc, module, options_first = self.commands[name]
+        if module is not None:
+            doc = importlib.import_module(module).__doc__
+        return compile_cache.get(doc, self.help, options_first)
+
+    def parse(self, argv=None):
+        """Parse `argv` (sys.argv[1:] by default).
+
+        Return (args, command, command_args): what the global doc
+        matched, the name of the command, and what the doc of that
+        command matched against the rest of `argv`, which starts with
+        the command itself.  The rest is not tokenized again.  If no
+        command was added with that name, `command_args` is None and
+        the command is left to the caller, e.g. to show help.
+
+        """
+        tokens = Tokens(sys.argv[1:] if argv is None else argv)
+        parser = compile_cache.get(self.doc, self.help, True)
+        args = parser.parse(tokens, self.version)
+        name = args.get(self.command)
+        if name not in self.commands:
+            return args, name, None
+        return args, name, self.parser(name).parse(tokens, self.version)
+
+
+def docopt_cmd(func):
+    """Decorate `do_*` method of a `cmd.Cmd` shell to parse its line.
+
+    The docstring of `func` is compiled once, when the class is
+    created, and each line is split with `shell_split` and parsed
+    with it; `func(self, args)` gets the result.  Errors are written to
+    the shell's `stdout`, and neither they nor --help leave the shell.
+
+    """
+    parser = compile(func.__doc__)
+
+    def do(self, line):
+        try:
+            args = parser.parse(shell_split(line))
+        except ValueError as e:  # unbalanced quotes
+            self.stdout.write('%s\n%s\n' % (e, parser.usage))
+            return None
+        except DocoptExit as e:
+            self.stdout.write('%s\n' % e)
+            return None
+        except SystemExit:  # --help, which was printed
+            return None
+        return func(self, args)
+    do.__name__, do.__doc__ = func.__name__, func.__doc__
+    do.parser = parser
+    return do
+
+
+class ParseFailure(object):
+
+    """Record of argv number `index` that `parse_many` could not parse."""
+
+    def __init__(self, index, argv, message):
+        self.index, self.argv, self.message = index, argv, message
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.__dict__ == other.__dict__
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'ParseFailure(%r, %r, %r)' % (self.index, self.argv,
+                                             self.message)
+
+
+def parse_chunk(task):
+    """Parse a chunk of argvs, see `parse_many`."""
+    parser, start, argvs, record = task
+    if not isinstance(parser, Docopt):  # (doc, help, options_first)
+        parser = compile_cache.get(*parser)
+    results = []
+    for index, argv in enumerate(argvs, start):
+        try:
+            results.append(parser.parse(argv, record=record))
+        except DocoptExit as e:
+            results.append(ParseFailure(index, argv, str(e)))
+    return results
+
+
+def pool_call(func, task):
+    """`func(task)` in a worker process, see `pooled`."""
+    try:
+        return func(task)
+    except Exception:
+        raise
+    except BaseException as e:  # would kill the worker and lose the task
+        raise RuntimeError('worker exited with %r' % (e,))
+
+
+def pooled(processes, func, tasks):
+    """Map `func` over `tasks` in order in a pool of worker processes.
+
+    Tasks are read as results are taken, two per process ahead, so that
+    neither tasks nor results pile up in memory (`Pool.imap` would read
+    all tasks at once).  Exceptions of `func`, even `SystemExit`, are
+    raised here instead of leaving the pool waiting for a dead worker.
+
+    """
+    import multiprocessing  # slow to import, and rarely needed
+    pool = multiprocessing.Pool(processes)
+    tasks = iter(tasks)
+
+    def submit(task):
+        return pool.apply_async(pool_call, (func, task))
+    try:
+        pending = deque(map(submit, itertools.islice(tasks, 2 * processes)))
+        while pending:
+            result = pending.popleft().get()
+            pending.extend(map(submit, itertools.islice(tasks, 1)))
+            yield result
+    finally:
+        pool.terminate()
+
+
+def parse_many(doc, argvs, options_first=False, processes=None,
+               chunksize=256, columns=False, record=False):
+    """Parse each of `argvs` against `doc` (a doc or a `Docopt` parser).
+
+    Return a generator of results, in order, with a `ParseFailure` in
+    place of each argv that raised `DocoptExit`.  `doc` is compiled
+    once, without `help`, even if it is a parser compiled with it, so
+    that --help in an argv is parsed like any other option instead of
+    printing help and exiting.
+
+    With `processes`, argvs are parsed by a pool of that many worker
+    processes, `chunksize` at a time.  With `columns`, return
+    (columns, failures) instead, where `columns` maps each name to the
+    list of its values in the results that did parse.  With `record`,
+    results are compact `Record`s, which are also cheaper to send back
+    from worker processes.
+
+    """
+    if not isinstance(doc, Docopt):
+        parser = compile_cache.get(doc, False, options_first)
+    elif doc.help:
+        parser = compile_cache.get(doc.doc, False, doc.options_first)
+    else:
+        parser = doc
+    if processes is not None:  # workers compile (and cache) it themselves
+        parser = parser.doc, False, parser.options_first
+    argvs = iter(argvs)
+    chunks = iter(lambda: list(itertools.islice(argvs, chunksize)), [])
+    tasks = ((parser, n * chunksize, chunk, record)
+             for n, chunk in enumerate(chunks))
+    if processes is None:
+        results = (parse_chunk(task) for task in tasks)
+    else:
+        results = pooled(processes, parse_chunk, tasks)
+    results = itertools.chain.from_iterable(results)
+    if not columns:
+        return results
+    table, failures = {}, []
+    for result in results:
+        if type(result) is ParseFailure:
+            failures.append(result)
+            continue
+        for name, value in result.items():
+            table.setdefault(name, []).append(value)
+    return table, failures
+
+
+def docopt(doc, argv=None, help=True, version=None, options_first=False,
+           profile=None):
     """Parse `argv` based on command-line interface described in `doc`.
 
     `docopt` creates your command-line interface based on its
@@ -511,6 +1761,10 @@ def docopt(doc, argv=None, help=True, version=None, options_first=False):
     options_first : bool (default: False)
         Set to True to require options precede positional arguments,
         i.e. to forbid options and positional arguments intermix.
+    profile : Profile, optional
+        Time each phase of compiling and parsing into it.  If not
+        passed and $DOCOPT_PROFILE is set, the phases of this call are
+        appended to the file it names as a line of JSON.
 
     Returns
     -------
@@ -545,37 +1799,272 @@ def docopt(doc, argv=None, help=True, version=None, options_first=False):
 
     See also
     --------
+    * `compile` to describe the interface once and parse many times.
+      `docopt` itself keeps recently used docs compiled in
+      `compile_cache`.
     * For video introduction see http://docopt.org
     * Full documentation is available in README.rst as well as online
       at https://github.com/docopt/docopt#readme
 
     """
-    argv = sys.argv[1:] if argv is None else argv
+    path = None
+    if profile is None and os.environ.get('DOCOPT_PROFILE'):
+        path, profile = os.environ['DOCOPT_PROFILE'], Profile()
+    parser = compile_cache.get(doc, help, options_first, profile)
+    try:
+        return parser.parse(argv, version, profile=profile)
+    finally:
+        if path is not None:
+            try:
+                profile.write(path, time=time.time(),
+                              prog=os.path.basename(sys.argv[0]))
+            except (IOError, OSError):  # profiling is best-effort
+                pass
+
+
+RUNTIME = r'''
+
+class DocoptExit(SystemExit):
+
+    """Exit in case user invoked program with incorrect arguments."""
 
-    usage_sections = parse_section('usage:', doc)
-    if len(usage_sections) == 0:
-        raise DocoptLanguageError('"usage:" (case-insensitive) not found.')
-    if len(usage_sections) > 1:
-        raise DocoptLanguageError('More than one "usage:" (case-insensitive).')
-    DocoptExit.usage = usage_sections[0]
-
-    options = parse_defaults(doc)
-    pattern = parse_pattern(formal_usage(DocoptExit.usage), options)
-    # [default] syntax for argument is disabled
-    #for a in pattern.flat(Argument):
-    #    same_name = [d for d in arguments if d.name == a.name]
-    #    if same_name:
-    #        a.value = same_name[0].value
-    argv = parse_argv(Tokens(argv), list(options), options_first)
-    pattern_options = set(pattern.flat(Option))
-    for options_shortcut in pattern.flat(OptionsShortcut):
-        doc_options = parse_defaults(doc)
-        options_shortcut.children = list(set(doc_options) - pattern_options)
-        #if any_options:
-        #    options_shortcut.children += [Option(o.short, o.long, o.argcount)
-        #                    for o in argv if type(o) is Option]
-    extras(help, version, argv, doc)
-    matched, left, collected = pattern.fix().match(argv)
-    if matched and left == []:  # better error message if left?
-        return Dict((a.name, a.value) for a in (pattern.flat() + collected))
+    usage = USAGE
+
+    def __init__(self, message=''):
+        SystemExit.__init__(self, (message + '\n' + self.usage).strip())
+
+
+class Dict(dict):
+    def __repr__(self):
+        return '{%s}' % ',\n '.join('%r: %r' % i for i in sorted(self.items()))
+
+
+def parse(argv=None, version=None):
+    """Parse `argv` (sys.argv[1:] by default) into a result dictionary."""
+    argv = sys.argv[1:] if argv is None else argv
+    left = parse_argv(argv.split() if hasattr(argv, 'split') else argv)
+    if HELP and any(name in ('-h', '--help') and v for name, v in left):
+        print(DOC.strip('\n'))
+        sys.exit()
+    if version and any(name == '--version' and v for name, v in left):
+        print(version)
+        sys.exit()
+    matched, left, collected = match(left, [])
+    if matched and left == []:
+        result = Dict((name, list(v) if type(v) is list else v)
+                      for name, v in DEFAULTS)
+        result.update(collected)
+        return result
     raise DocoptExit()
+
+
+def parse_argv(argv):
+    tokens = list(reversed(argv))  # next token is tokens[-1]
+    options = list(OPTIONS)
+    parsed = []
+    while tokens:
+        token = tokens[-1]
+        if token == '--' or OPTIONS_FIRST and (
+                token == '-' or not token.startswith('-')):
+            return parsed + [(None, v) for v in reversed(tokens)]
+        elif token.startswith('--'):
+            parsed.append(parse_long(tokens, options))
+        elif token.startswith('-') and token != '-':
+            parsed += parse_shorts(tokens, options)
+        else:
+            parsed.append((None, tokens.pop()))
+    return parsed
+
+
+def parse_long(tokens, options):
+    long, eq, value = tokens.pop().partition('=')
+    value = None if eq == value == '' else value
+    similar = [o for o in options if o[1] == long]
+    if similar == []:
+        similar = [o for o in options if o[1] and o[1].startswith(long)]
+    if len(similar) > 1:
+        raise DocoptExit('%s is not a unique prefix: %s?' %
+                         (long, ', '.join(o[1] for o in similar)))
+    elif len(similar) < 1:
+        argcount = 1 if eq == '=' else 0
+        options.append((None, long, argcount))
+        return long, value if argcount else True
+    long, argcount = similar[0][1], similar[0][2]
+    if argcount == 0:
+        if value is not None:
+            raise DocoptExit('%s must not have an argument' % long)
+    elif value is None:
+        if tokens == [] or tokens[-1] == '--':
+            raise DocoptExit('%s requires argument' % long)
+        value = tokens.pop()
+    return long, value if value is not None else True
+
+
+def parse_shorts(tokens, options):
+    left = tokens.pop().lstrip('-')
+    parsed = []
+    while left != '':
+        short, left = '-' + left[0], left[1:]
+        similar = [o for o in options if o[0] == short]
+        if len(similar) > 1:
+            raise DocoptExit('%s is specified ambiguously %d times' %
+                             (short, len(similar)))
+        elif len(similar) < 1:
+            options.append((short, None, 0))
+            parsed.append((short, True))
+            continue
+        value = None
+        if similar[0][2] != 0:
+            if left == '':
+                if tokens == [] or tokens[-1] == '--':
+                    raise DocoptExit('%s requires argument' % short)
+                value = tokens.pop()
+            else:
+                value, left = left, ''
+        parsed.append((similar[0][1] or short,
+                       value if value is not None else True))
+    return parsed
+
+
+def option(name, left):
+    for n, (name_, value) in enumerate(left):
+        if name_ == name:
+            return n, value
+    return None, None
+
+
+def argument(name, left):
+    for n, (name_, value) in enumerate(left):
+        if name_ is None:
+            return n, value
+    return None, None
+
+
+def command(name, left):
+    for n, (name_, value) in enumerate(left):
+        if name_ is None:
+            return (n, True) if value == name else (None, None)
+    return None, None
+
+
+def leaf(single_match, name, kind, left, collected):
+    pos, value = single_match(name, left)
+    if pos is None:
+        return False, left, collected
+    left_ = left[:pos] + left[pos + 1:]
+    if kind is None:
+        return True, left_, collected + [(name, value)]
+    increment = 1 if kind is int else [value] if type(value) is str else value
+    for n, (name_, value_) in enumerate(collected):
+        if name_ == name:
+            collected = list(collected)
+            collected[n] = (name, value_ + increment)
+            return True, left_, collected
+    return True, left_, collected + [(name, increment)]
+'''
+
+
+def generate(doc, help=True, options_first=False, source='<doc>'):
+    """Return source of a standalone module that parses argv like `doc`.
+
+    The module has no dependencies; its `parse(argv=None, version=None)`
+    gives the same results as `docopt(doc, argv, help, version,
+    options_first)`, but the usage pattern is compiled into plain Python
+    functions, so neither `doc` nor the pattern tree is processed at
+    run time.  Also available as `python -m docopt generate script.py`.
+
+    """
+    parser = Docopt(doc, help=help, options_first=options_first)
+    names, code = {}, []
+
+    def emit(pattern):
+        if id(pattern) in names:  # fix_identities shares equal leaves
+            return names[id(pattern)]
+        name = names[id(pattern)] = 'match%d' % len(names)
+        calls = [emit(child) for child in getattr(pattern, 'children', [])]
+        lines = ['def %s(left, collected):' % name]
+        if type(pattern) in (Option, Argument, Command):
+            kind = {int: 'int', list: 'list'}.get(type(pattern.value), None)
+            lines.append('    return leaf(%s, %r, %s, left, collected)' %
+                         (type(pattern).__name__.lower(), pattern.name, kind))
+        elif type(pattern) is Required:
+            lines.append('    l, c = left, collected')
+            for call in calls:
+                lines += ['    matched, l, c = %s(l, c)' % call,
+                          '    if not matched:',
+                          '        return False, left, collected']
+            lines.append('    return True, l, c')
+        elif type(pattern) in (Optional, OptionsShortcut):
+            for call in calls:
+                lines.append('    m, left, collected = %s(left, collected)'
+                             % call)
+            lines.append('    return True, left, collected')
+        elif type(pattern) is OneOrMore:
+            lines += ['    l, c, n, times, matched = left, collected, '
+                      'None, 0, True',
+                      '    while matched:',
+                      '        matched, l, c = %s(l, c)' % calls[0],
+                      '        times += 1 if matched else 0',
+                      '        if n == len(l):',
+                      '            break',
+                      '        n = len(l)',
+                      '    if times >= 1:',
+                      '        return True, l, c',
+                      '    return False, left, collected']
+        elif type(pattern) is Either:
+            lines += ['    outcomes = [o for o in ('] + \
+                     ['        %s(left, collected),' % c for c in calls] + \
+                     ['    ) if o[0]]',
+                      '    if outcomes:',
+                      '        return min(outcomes, key=lambda o: len(o[1]))',
+                      '    return False, left, collected']
+        code.append('\n'.join(lines))
+        return name
+
+    match = emit(parser.pattern)
+    options = [(o.short, o.long, o.argcount) for o in parser.options]
+    defaults = OrderedDict((a.name, a.value) for a in parser.pattern.flat())
+    return '\n'.join([
+        '"""Command-line parser generated by docopt %s from %s.' % (
+            __version__, source),
+        '',
+        'Do not edit; regenerate with `python -m docopt generate`.',
+        '',
+        '"""',
+        'import sys',
+        '',
+        'DOC = %r' % doc,
+        'USAGE = %r' % parser.usage,
+        'HELP = %r' % bool(help),
+        'OPTIONS_FIRST = %r' % bool(options_first),
+        'OPTIONS = %r' % options,
+        'DEFAULTS = %r' % list(defaults.items()),
+        RUNTIME] + ['\n\n' + c for c in code] + ['\n\nmatch = %s\n' % match])
+
+
+def main(argv=None):
+    """Usage: docopt.py generate [options] <script>
+
+    Print a parser module generated from the docstring of <script>.
+    The module parses arguments like docopt does, without needing
+    docopt to be installed.
+
+    Options:
+      --options-first  Options must precede positional arguments.
+      --no-help        Do not handle -h and --help automatically.
+
+    """
+    import ast
+    args = docopt(main.__doc__, argv)
+    with open(args['<script>']) as f:
+        tree = ast.parse(f.read())
+    doc = ast.get_docstring(tree, clean=False)
+    if doc is None:
+        raise DocoptExit('%s has no docstring' % args['<script>'])
+    sys.stdout.write(generate(doc, help=not args['--no-help'],
+                              options_first=args['--options-first'],
+                              source=os.path.basename(args['<script>'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -25,30 +25,27 @@ See 'git help <command>' for more information on a specific command.
 """
 from subprocess import call
 
-from docopt import docopt
+from docopt import Subcommands
 
 
 if __name__ == '__main__':
 
-    args = docopt(__doc__,
-                  version='git version 1.7.4.4',
-                  options_first=True)
+    cli = Subcommands(__doc__, version='git version 1.7.4.4')
+    # Subcommands implemented as python modules are imported (and their
+    # docstrings parsed) only when invoked:
+    for command in 'add checkout clone commit push remote'.split():
+        cli.add(command, module='git_' + command)
+    # In case subcommand is a script in some other programming language,
+    # it can still get the arguments as they were:
+    cli.add('branch', 'usage: git branch [<args>...]', options_first=True)
+    args, command, command_args = cli.parse()
+    if command in ['help', None]:
+        exit(call(['python', 'git.py', '--help']))
+    elif command_args is None:
+        exit("%r is not a git.py command. See 'git help'." % command)
     print('global arguments:')
     print(args)
     print('command arguments:')
-
-    argv = [args['<command>']] + args['<args>']
-    if args['<command>'] == 'add':
-        # In case subcommand is implemented as python module:
-        import git_add
-        print(docopt(git_add.__doc__, argv=argv))
-    elif args['<command>'] == 'branch':
-        # In case subcommand is a script in some other programming language:
-        exit(call(['python', 'git_branch.py'] + argv))
-    elif args['<command>'] in 'checkout clone commit push remote'.split():
-        # For the rest we'll just keep DRY:
-        exit(call(['python', 'git_%s.py' % args['<command>']] + argv))
-    elif args['<command>'] in ['help', None]:
-        exit(call(['python', 'git.py', '--help']))
-    else:
-        exit("%r is not a git.py command. See 'git help'." % args['<command>'])
+    if command == 'branch':
+        exit(call(['python', 'git_branch.py', command] + args['<args>']))
+    print(command_args)
@@ -17,40 +17,12 @@ Options:
 
 import sys
 import cmd
-from docopt import docopt, DocoptExit
-
-
-def docopt_cmd(func):
-    """
-    This decorator is used to simplify the try/except block and pass the result
-    of the docopt parsing to the called action.
-    """
-    def fn(self, arg):
-        try:
-            opt = docopt(fn.__doc__, arg)
-
-        except DocoptExit as e:
-            # The DocoptExit is thrown when the args do not match.
-            # We print a message to the user and the usage block.
-
-            print('Invalid Command!')
-            print(e)
-            return
-
-        except SystemExit:
-            # The SystemExit exception prints the usage for --help
-            # We do not need to do the print here.
-
-            return
-
-        return func(self, opt)
-
-    fn.__name__ = func.__name__
-    fn.__doc__ = func.__doc__
-    fn.__dict__.update(func.__dict__)
-    return fn
+from docopt import docopt, docopt_cmd
 
 
+# docopt_cmd compiles the docstring of each do_* method once, and parses
+# each line typed for it (split like a shell would) into its `arg`.  If
+# the line does not match, it prints the usage and the shell goes on.
 class MyInteractive (cmd.Cmd):
     intro = 'Welcome to my interactive program!' \
         + ' (type help for a list of commands.)'
@@ -1,12 +1,26 @@
 from __future__ import with_statement
-from docopt import (docopt, DocoptExit, DocoptLanguageError,
+import os
+import sys
+import cmd
+import json
+import shlex
+import pickle
+import threading
+
+from docopt import (docopt, compile, Docopt, DocoptExit, DocoptLanguageError,
+                    CompileCache, Subcommands, Profile, cache_key, generate,
+                    parse_many, pooled, ParseFailure, shell_split, docopt_cmd,
+                    Record,
                     Option, Argument, Command, OptionsShortcut,
                     Required, Optional, Either, OneOrMore,
                     parse_argv, parse_pattern, parse_section,
-                    parse_defaults, formal_usage, Tokens, transform
+                    parse_defaults, formal_usage, Tokens, transform,
+                    occurrences, leads, linear, Argv, MatchState, Memo, Options
                    )
 from pytest import raises
 
+from conftest import parse_test
+
 
 def test_pattern_flat():
     assert Required(OneOrMore(Argument('N')),
@@ -75,6 +89,16 @@ def test_formal_usage():
     assert formal_usage(usage) == "( [-hv] ARG ) | ( N M )"
 
 
+def test_tokens():
+    tokens = Tokens('--a=1 -bc - x --')
+    kinds = []
+    while tokens:
+        kinds.append(tokens.kind())
+        tokens.move()
+    assert kinds == ['long', 'shorts', 'argument', 'argument', '--']
+    assert tokens.move() is tokens.current() is tokens.kind() is None
+
+
 def test_parse_argv():
     o = [Option('-h'), Option('-v', '--verbose'), Option('-f', '--file', 1)]
     TS = lambda s: Tokens(s, error=DocoptExit)
@@ -100,6 +124,33 @@ def test_parse_argv():
              Argument(None, '-v')]
 
 
+def test_options_index():
+    o = Options([Option('-h'), Option('-v', '--verbose'),
+                 Option('-f', '--file', 1), Option(None, '--verbatim')])
+    assert o.short('-v') == [Option('-v', '--verbose')]
+    assert o.long('--file') == [Option('-f', '--file', 1)]
+    assert o.prefix('--verb') == [Option('-v', '--verbose'),
+                                  Option(None, '--verbatim')]
+    assert o.prefix('--x') == o.short('-x') == []
+    overlay = Options(base=o)
+    parse_argv(Tokens('--xyz --verbose'), overlay)
+    assert overlay == [Option(None, '--xyz')] and len(o) == 4
+    assert overlay.prefix('--x') == [Option(None, '--xyz')]
+    assert overlay.prefix('--verbo') == [Option('-v', '--verbose')]
+    with raises(DocoptExit) as e:
+        parse_argv(Tokens('--verb'), overlay)
+    assert str(e.value).startswith(
+            '--verb is not a unique prefix: --verbose, --verbatim?')
+    assert pickle.loads(pickle.dumps(o)).prefix('--verba') == \
+            [Option(None, '--verbatim')]
+    options = [Option('-v', '--verbose')]
+    parse_pattern('-v --new [-x]', options)
+    assert options == [Option('-v', '--verbose'), Option(None, '--new'),
+                       Option('-x')]
+    parse_argv(Tokens('--verb -y'), options)
+    assert options[-1] == Option('-y') and len(options) == 4
+
+
 def test_parse_pattern():
     o = [Option('-h'), Option('-v', '--verbose'), Option('-f', '--file', 1)]
     assert parse_pattern('[ -h ]', options=o) == \
@@ -265,6 +316,92 @@ def test_list_argument_match():
                     (True, [], [Argument('N', ['1', '2'])])
 
 
+def test_match_state():
+    argv = Argv([Option('-v', value=True), Argument(None, 'a'),
+                 Option('-v', value=True)])
+    state = MatchState(argv)
+    taken = Option('-v').match_state(state)
+    assert state.left() == argv.patterns
+    assert taken.left() == [Argument(None, 'a'), Option('-v', value=True)]
+    assert taken.collected() == [Option('-v', value=True)]
+    assert Command('a').match_state(taken).collected() == \
+            [Option('-v', value=True), Command('a', True)]
+    assert Command('b').match_state(taken) is None
+    assert state.collected() == []
+    # alternatives that do not match do not count
+    assert docopt('usage: prog -v (-v -v x | -v -v)', '-vvv') == \
+            {'-v': 3, 'x': False}
+
+
+def test_memo():
+    parser = compile("""usage: prog [options] (x | y) a
+                             prog [options] (x | y) b
+
+                      options:
+                        -v""")
+    assert parser.pattern.children[0].children[0].children[0] is \
+            parser.pattern.children[0].children[1].children[0]
+    memo = Memo()
+    for argv in ['-v y b', 'x', '-v x b a']:
+        try:
+            expected = parser.parse(argv)
+        except DocoptExit:
+            with raises(DocoptExit):
+                parser.parse(argv, memo=memo)
+        else:
+            assert parser.parse(argv, memo=memo) == expected
+    parser.parse('-v y b', memo=memo)
+    assert memo.hits == 2 and memo.misses == 4
+    memo = Memo(limit=0)
+    parser.parse('-v y b', memo=memo)
+    assert memo.hits == 0 and memo.size == 0
+
+
+def test_all():
+    import docopt as module
+    assert all(hasattr(module, name) for name in module.__all__)
+    assert 'compile' not in module.__all__  # the builtin
+
+
+def test_engines():
+    with open(os.path.join(os.path.dirname(__file__),
+                           'testcases.docopt')) as f:
+        fixtures = list(parse_test(f.read()))
+    for _, doc, cases in fixtures:
+        try:
+            compiled, tree = Docopt(doc), Docopt(doc, engine='tree')
+        except DocoptLanguageError:
+            continue
+        for _, argv, _ in cases:
+            try:
+                expected = tree.parse(argv, memo=Memo())
+            except DocoptExit:
+                with raises(DocoptExit):
+                    compiled.parse(argv)
+                with raises(DocoptExit):
+                    compiled.parse(argv, memo=Memo())
+            except SystemExit:
+                pass  # --help, --version
+            else:
+                assert compiled.parse(argv) == expected
+                assert compiled.parse(argv, memo=Memo()) == expected
+    parser = pickle.loads(pickle.dumps(compile('usage: prog [-v] <x>...')))
+    assert parser.parse('-v a b') == {'-v': True, '<x>': ['a', 'b']}
+    with raises(ValueError):
+        Docopt('usage: prog', engine='nfa')
+
+
+def test_large_argv():
+    files = ['file%d' % i for i in range(100000)]
+    for engine in Docopt.engines:
+        parser = Docopt('usage: prog [-v] <x> <file>...', engine=engine)
+        assert parser.parse(['a'] + files + ['-v']) == \
+                {'-v': True, '<x>': 'a', '<file>': files}
+        parser = Docopt('usage: prog [-v] [--] <file>...', engine=engine)
+        assert parser.parse(['-v', '--'] + files, memo=Memo()) == \
+                {'-v': True, '--': True, '<file>': files}
+
+
 def test_basic_pattern_matching():
     # ( -a N [ -x Z ] )
     pattern = Required(Option('-a'), Argument('N'),
@@ -316,17 +453,96 @@ def test_pattern_fix_repeating_arguments():
             Either(Argument('N', []), OneOrMore(Argument('N', [])))
 
 
+def test_occurrences():
+    a, b, c = Option('-a'), Argument('B'), Command('c')
+    assert occurrences(a) == {a: 1}
+    assert occurrences(Required(a, Optional(a, b), Either(b, c))) == \
+            {a: 2, b: 2, c: 1}
+    assert occurrences(Either(Required(a, b), Required(b, c))) == \
+            {a: 1, b: 1, c: 1}
+    assert occurrences(Required(OneOrMore(a), Either(b, OneOrMore(c)))) == \
+            {a: 2, b: 1, c: 2}
+    pattern = Required(Either(a, Required(b, b)), Either(Optional(c), a),
+                       OneOrMore(Either(b, Required(c, a))))
+    expected = {}
+    for case in transform(pattern).children:
+        for e in case.children:
+            expected[e] = max(expected.get(e, 0),
+                              min(case.children.count(e), 2))
+    assert occurrences(pattern) == expected
+
+
 def test_set():
     assert Argument('N') == Argument('N')
     assert set([Argument('N'), Argument('N')]) == set([Argument('N')])
 
 
+def test_pattern_slots():
+    pattern = Required(Option('-f', '--file', 1, 'x'), OptionsShortcut(),
+                       Either(Command('go', 2), OneOrMore(Argument('<n>'))))
+    for node in [pattern] + pattern.flat():
+        assert not hasattr(node, '__dict__')
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        copy = pickle.loads(pickle.dumps(pattern, protocol))
+        assert copy == pattern and repr(copy) == repr(pattern)
+
+
+def test_leads():
+    assert leads(parse_pattern('add <x>', [])) == ({'add'}, False)
+    assert leads(parse_pattern('-v [go] (run | <x>) stop', [])) == \
+            (None, False)
+    assert leads(parse_pattern('[-v] [go] (run | stop) <x>', [])) == \
+            ({'go', 'run', 'stop'}, False)
+    assert leads(parse_pattern('(a | [-v]) b...', [])) == ({'a', 'b'}, False)
+    assert leads(parse_pattern('[a | b] [-v]', [])) == ({'a', 'b'}, True)
+
+
+def test_linear():
+    for usage in ['usage: prog (a | b)', 'usage: prog <x>...',
+                  'usage: prog <x> <x>', 'usage: prog a\n       prog b']:
+        parser = compile(usage)
+        assert linear(parser.pattern, parser.layout.index) is None
+        assert parser.match_linear is None
+    usage = 'usage: prog copy [(-r <depth>)] <src> [<dst>] [-f]'
+    parser, tree = compile(usage), compile(usage, engine='tree')
+    assert parser.match_linear is not None
+    assert parser.parse('copy a -f') == {
+        'copy': True, '-r': False, '<depth>': None, '<src>': 'a',
+        '<dst>': None, '-f': True}
+    assert parser.parse('copy -r 2 a b', record=True) == {
+        'copy': True, '-r': True, '<depth>': '2', '<src>': 'a',
+        '<dst>': 'b', '-f': False}
+    for argv in ['copy -r a b', 'copy a -r b', 'copy -- -r', 'copy -f a']:
+        assert parser.parse(argv) == tree.parse(argv)
+    for argv in ['copy', 'copy -r a', 'copy a -f -f', 'copy a b c', 'move a',
+                 'copy -x a', 'copy -- -r a b']:
+        with raises(DocoptExit):
+            parser.parse(argv)
+    parser = pickle.loads(pickle.dumps(parser))
+    assert parser.match_linear is not None
+    assert compile('usage: prog <x>', engine='tree').match_linear is None
+
+
+def test_pattern_equality():
+    # equal exactly when repr()s are equal
+    assert Option('-a', None, 0, True) != Option('-a', None, 0, 1)
+    assert Option('-a', '--all') != Option(None, '--all')
+    assert Argument('N', []) != Argument('N', None)
+    assert Argument('add') != Command('add')
+    assert Required(Argument('N', ['1'])) == Required(Argument('N', ['1']))
+    assert Required(Argument('N')) != Optional(Argument('N'))
+    assert hash(Required(Option('-a', value=['x']))) == \
+            hash(Required(Option('-a', value=['x'])))
+    assert Option('-a') != repr(Option('-a'))
+
+
 def test_pattern_fix_identities_1():
     pattern = Required(Argument('N'), Argument('N'))
     assert pattern.children[0] == pattern.children[1]
     assert pattern.children[0] is not pattern.children[1]
+    first = pattern.children[0]
     pattern.fix_identities()
-    assert pattern.children[0] is pattern.children[1]
+    assert pattern.children[0] is pattern.children[1] is first
 
 
 def test_pattern_fix_identities_2():
@@ -427,6 +643,241 @@ def test_docopt():
     #    docopt(doc, 'help')  XXX Maybe help command?
 
 
+def test_compile():
+    doc = """Usage: prog [-v...] [--path=<p>...] <file>...
+
+             Options:
+               --path=<p>  Search path [default: a b]"""
+    parser = compile(doc)
+    assert type(parser) is Docopt
+    pattern = repr(parser.pattern)
+    a = parser.parse('-vv x y')
+    assert a == docopt(doc, '-vv x y') == {'-v': 2, '--path': ['a', 'b'],
+                                            '<file>': ['x', 'y']}
+    a['--path'].append('c')
+    assert parser.parse('z') == {'-v': 0, '--path': ['a', 'b'],
+                                 '<file>': ['z']}
+    with raises(DocoptExit):
+        parser.parse('-x')
+    assert repr(parser.pattern) == pattern
+    with raises(DocoptLanguageError):
+        compile('no usage with colon here')
+
+
+def test_compile_cache():
+    cache = CompileCache(maxsize=2)
+    a = cache.get('usage: prog a')
+    assert cache.get('usage: prog a') is a
+    assert cache.get('usage: prog a', options_first=True) is not a
+    cache.get('usage: prog b')
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 3, 1)
+    assert cache.get('usage: prog a') is not a
+    cache.resize(0)
+    assert len(cache) == 0
+    assert cache.get('usage: prog a') is not cache.get('usage: prog a')
+    assert len(cache) == 0
+    cache.clear()
+    assert (cache.hits, cache.misses, cache.evictions) == (0, 0, 0)
+
+
+def test_compile_cache_dir(tmpdir):
+    doc = """Usage: prog [options] <x>...
+
+             Options:
+               -v, --verbose
+               --level=<n>  [default: 3]"""
+    parser = compile(doc, cache_dir=str(tmpdir))
+    assert tmpdir.join(cache_key(doc)).check()
+    cached = compile(doc, cache_dir=str(tmpdir))
+    assert cached is not parser
+    assert repr(cached.pattern) == repr(parser.pattern)
+    assert cached.parse('--verb a b') == parser.parse('--verb a b') == \
+            {'--verbose': True, '--level': '3', '<x>': ['a', 'b']}
+    assert cache_key(doc) != cache_key(doc, options_first=True)
+    tmpdir.join(cache_key(doc)).write('garbage')
+    assert compile(doc, cache_dir=str(tmpdir)).parse('a') == \
+            {'--verbose': False, '--level': '3', '<x>': ['a']}
+
+
+def test_subcommands(tmpdir, monkeypatch):
+    tmpdir.join('prog_put.py').write('"""usage: prog put [-f] <key>"""')
+    monkeypatch.syspath_prepend(str(tmpdir))
+    cli = Subcommands('usage: prog [-v] <command> [<args>...]')
+    cli.add('get', 'usage: prog get [-f] <key>')
+    cli.add('put', module='prog_put')
+    assert cli.parse('-v get -f x') == (
+            {'-v': True, '<command>': 'get', '<args>': ['-f', 'x']},
+            'get', {'get': True, '-f': True, '<key>': 'x'})
+    assert 'prog_put' not in sys.modules
+    assert cli.parse('put x')[1:] == \
+            ('put', {'put': True, '-f': False, '<key>': 'x'})
+    assert sys.modules.pop('prog_put')
+    assert cli.parse('del x') == (
+            {'-v': False, '<command>': 'del', '<args>': ['x']}, 'del', None)
+    with raises(DocoptExit):
+        cli.parse('get')
+    with raises(ValueError):
+        cli.add('del')
+
+
+def test_parse_many():
+    doc = """Usage: prog [options] <x>
+
+             Options:
+               -h, --help
+               -v"""
+    argvs = ['a', '-v b', 'c d', '--help a']
+    expected = [{'-v': False, '--help': False, '<x>': 'a'},
+                {'-v': True, '--help': False, '<x>': 'b'},
+                ParseFailure(2, 'c d', 'Usage: prog [options] <x>'),
+                {'-v': False, '--help': True, '<x>': 'a'}]
+    assert list(parse_many(doc, argvs, chunksize=3)) == expected
+    assert list(parse_many(compile(doc, help=False), iter(argvs),
+                           processes=2, chunksize=1)) == expected
+    for processes in (None, 2):
+        assert list(parse_many(compile(doc), argvs, processes=processes,
+                               chunksize=1)) == expected
+    with raises(RuntimeError):
+        list(pooled(1, sys.exit, [0]))
+    assert parse_many(doc, argvs, columns=True) == (
+            {'-v': [False, True, False], '--help': [False, False, True],
+             '<x>': ['a', 'b', 'a']}, [expected[2]])
+    read = []
+
+    def endless():
+        while True:
+            read.append(None)
+            yield 'a'
+
+    results = parse_many(doc, endless(), processes=1, chunksize=10)
+    assert [next(results) for _ in range(25)] == [expected[0]] * 25
+    assert len(read) == 10 * 5  # 3 chunks taken, 2 more in flight
+
+
+def test_concurrent_parsing():
+    docs = ['usage: prog%d [-v] <command>' % n for n in range(8)]
+    errors = []
+
+    def parse(n):
+        doc = docs[n % len(docs)]
+        try:
+            for i in range(200):
+                assert docopt(doc, '-v x') == {'-v': True, '<command>': 'x'}
+                with raises(DocoptExit) as e:
+                    docopt(doc, '-v' if i % 2 else '--unknown x')
+                assert str(e.value).endswith(doc)
+                with raises(DocoptExit) as e:
+                    Subcommands(doc).parse('-v')
+                assert str(e.value) == doc
+        except BaseException as e:  # including failures of `raises`
+            errors.append(e)
+
+    threads = [threading.Thread(target=parse, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_record():
+    parser = compile('usage: prog [-v] [--dry-run] <file>...')
+    record = parser.parse('-v a b', record=True)
+    assert type(record) is Record and record._layout is parser.layout
+    assert record == parser.parse('-v a b') == dict(record)
+    assert record['<file>'] == record.file == ['a', 'b']
+    assert record.dry_run is False and record.v is True
+    assert list(record) == ['-v', '--dry-run', '<file>'] and len(record) == 3
+    assert list(record.values()) == [True, False, ['a', 'b']]
+    assert list(record.items()) == [('-v', True), ('--dry-run', False),
+                                    ('<file>', ['a', 'b'])]
+    named = compile('usage: prog <values> <layout>').parse('x y', record=True)
+    assert named['<values>'] == 'x' and named.layout == 'y'
+    with raises(AttributeError):
+        record.verbose
+    with raises(KeyError):
+        record['--verbose']
+    other = parser.parse('c', record=True)
+    records = pickle.loads(pickle.dumps([record, other], 2))
+    assert records == [record, other]
+    assert records[0]._layout is records[1]._layout
+    assert repr(record) == repr(parser.parse('-v a b'))
+
+
+def test_result_template():
+    parser = compile("""usage: prog [-v...] [--path=<p>]... [<file>...]
+
+    options:
+      --path=<p>  Paths [default: a b]
+
+    """)
+    assert parser.defaults == (0, ['a', 'b'], [])
+    first = parser.parse('')
+    assert first == {'-v': 0, '--path': ['a', 'b'], '<file>': []}
+    first['--path'].append('c')
+    first['<file>'].append('d')
+    assert parser.parse('') == {'-v': 0, '--path': ['a', 'b'], '<file>': []}
+    assert parser.parse('-vv x --path=y', record=True) == {
+        '-v': 2, '--path': ['y'], '<file>': ['x']}
+    assert parser.defaults == (0, ['a', 'b'], [])
+
+
+def test_shell_split():
+    for line in ['a  b', 'a "b \\" c" \'d e\'f', 'a\\ b "" \'\'', '"x\\y"']:
+        assert shell_split(line) == shlex.split(line)
+    for line in ['"a', "it's", 'a\\']:
+        with raises(ValueError):
+            shell_split(line)
+
+
+def test_docopt_cmd():
+    class Shell(cmd.Cmd):
+        @docopt_cmd
+        def do_copy(self, args):
+            """Usage: copy [-f] <src> <dst>"""
+            self.args = args
+
+    class Output(list):
+        write = list.append
+
+    stdout = Output()
+    shell = Shell(stdout=stdout)
+    shell.onecmd('copy -f "a b" c')
+    assert shell.args == {'-f': True, '<src>': 'a b', '<dst>': 'c'}
+    shell.onecmd('copy a')
+    shell.onecmd("copy 'a")
+    assert ''.join(stdout) == ('Usage: copy [-f] <src> <dst>\n'
+                               'No closing quotation\n'
+                               'Usage: copy [-f] <src> <dst>\n')
+    assert Shell.do_copy.__doc__ == 'Usage: copy [-f] <src> <dst>'
+
+
+def test_generate():
+    def run(parse, argv):
+        try:
+            return parse(argv)
+        except SystemExit as e:  # DocoptExit of the generated module, too
+            return str(e)
+
+    with open(os.path.join(os.path.dirname(__file__),
+                           'testcases.docopt')) as f:
+        fixtures = list(parse_test(f.read()))
+    fixtures.append((None, 'usage: prog [-v] <a> [<b>...]',
+                     [(None, argv, None) for argv in ['- -v', '-v - -v']]))
+    for _, doc, cases in fixtures:
+        for options_first in (False, True):
+            try:
+                namespace = {}
+                exec(generate(doc, options_first=options_first), namespace)
+            except DocoptLanguageError:
+                continue
+            for _, argv, _ in cases:
+                assert run(namespace['parse'], argv) == run(
+                        lambda argv: docopt(doc, argv,
+                                            options_first=options_first),
+                        argv)
+
+
 def test_language_errors():
     with raises(DocoptLanguageError):
         docopt('no usage with colon here')
@@ -611,6 +1062,30 @@ def test_parse_section():
     ]
 
 
+def test_profile(tmpdir, monkeypatch):
+    doc = 'usage: prog [options] <x>\n\noptions:\n  -v  Verbose.'
+    profile = Profile()
+    parser = compile(doc, profile=profile)
+    assert parser.parse('-v a', profile=profile) == {'-v': True, '<x>': 'a'}
+    assert profile.calls == {'parse_section': 1, 'parse_defaults': 2,
+                             'parse_pattern': 1, 'fix': 1, 'parse_argv': 1,
+                             'match': 1}
+    assert all(seconds >= 0 for seconds in profile.seconds.values())
+    with raises(DocoptExit):
+        parser.parse('a b', profile=profile)
+    assert profile.calls['match'] == 2
+    path = tmpdir.join('profile.jsonl')
+    monkeypatch.setenv('DOCOPT_PROFILE', str(path))
+    docopt(doc, 'a')
+    with raises(DocoptExit):
+        docopt(doc, 'a b')
+    records = [json.loads(line) for line in path.readlines()]
+    assert len(records) == 2
+    assert records[1]['phases']['match']['calls'] == 1
+    assert records[1]['phases']['fix']['calls'] == 0  # cached
+    assert set(records[0]) == {'phases', 'prog', 'time'}
+
+
 def test_issue_126_defaults_not_parsed_correctly_when_tabs():
     section = 'Options:\n\t--foo=<arg>  [default: bar]'
     assert parse_defaults(section) == [Option(None, '--foo', 1, 'bar')]